@@ -1,22 +1,36 @@
 import json
 import re
+import time
 import boto3
 from datetime import datetime
 from urllib.request import urlopen, Request
 from html.parser import HTMLParser
 from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson  # optional: faster JSON for request/response bodies if bundled in the layer
+except ImportError:
+    orjson = None
+
 REGION = "eu-west-2"
 CLAUDE_MODEL = "anthropic.claude-3-haiku-20240307-v1:0"
 
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
-bedrock = boto3.client("bedrock-runtime", region_name=REGION)
+# Created once per container and shared across warm invocations
+session = boto3.session.Session(region_name=REGION)
+BOTO_CONFIG = Config(retries={"mode": "adaptive", "max_attempts": 5}, tcp_keepalive=True)
+dynamodb = session.resource("dynamodb", config=BOTO_CONFIG)
+bedrock = session.client("bedrock-runtime", config=BOTO_CONFIG)
 
 insights_cache = dynamodb.Table("InsightsCache")
 runway_table = dynamodb.Table("New_Fashion_Analysis")
 articles_table = dynamodb.Table("ArticleCache")
 
+# Warm Lambda containers keep module state, so per-show lookups are cached here
+CACHE_TTL_SECONDS = 300
+_show_cache: dict = {}
+
 SYSTEM_PROMPT = """You are a fashion intelligence assistant with access to structured analysis
 combining editorial reviews (Vogue, WWD) with computer vision data from runway photographs.
 
@@ -65,6 +79,17 @@ Question: {question}"""
 
 # ─── Q&A data helpers ─────────────────────────────────────────────────────────
 
+def _cached(kind: str, designer: str, season: str, loader):
+    """Return loader(designer, season), reusing a result younger than CACHE_TTL_SECONDS."""
+    key = (kind, designer, season)
+    hit = _show_cache.get(key)
+    if hit and time.monotonic() - hit[0] < CACHE_TTL_SECONDS:
+        return hit[1]
+    value = loader(designer, season)
+    _show_cache[key] = (time.monotonic(), value)
+    return value
+
+
 def _get_insights(designer: str, season: str) -> dict | None:
     try:
         cache_key = f"{designer}#{season}"
@@ -93,6 +118,8 @@ def _get_raw_runway(designer: str, season: str) -> list:
             Key("designer_lower").eq(designer_lower)
             & Key("season_lower").eq(season_lower)
         ),
+        # Only the fields the context/image helpers read
+        "ProjectionExpression": "color_name, item_name, materials, original_image_name",
     }
     try:
         while True:
@@ -380,7 +407,8 @@ def lambda_handler(event, context):
         return _response(200, {})
 
     try:
-        body = json.loads(event.get("body") or "{}")
+        raw_body = event.get("body") or "{}"
+        body = orjson.loads(raw_body) if orjson else json.loads(raw_body)
         question = body.get("question", "").strip()
         history = body.get("history", [])
 
@@ -401,10 +429,10 @@ def lambda_handler(event, context):
         context_block = ""
         image_urls = []
         if designer and season:
-            insights = _get_insights(designer, season)
+            insights = _cached("insights", designer, season, _get_insights)
             if insights:
                 context_block = f"\n\n[FASHION DATA — synthesized insights]\n{_insights_to_context(insights)}\n[END DATA]"
-            raw = _get_raw_runway(designer, season)
+            raw = _cached("runway", designer, season, _get_raw_runway)
             if raw:
                 if not insights:
                     context_block = f"\n\n[FASHION DATA — raw runway analysis]\n{_raw_runway_to_context(raw, designer, season)}\n[END DATA]"
@@ -440,5 +468,5 @@ def _response(status: int, body: dict) -> dict:
             "Access-Control-Allow-Methods": "POST, OPTIONS",
             "Access-Control-Allow-Headers": "Content-Type",
         },
-        "body": json.dumps(body),
+        "body": orjson.dumps(body).decode() if orjson else json.dumps(body),
     }
@@ -1,19 +1,76 @@
+import os
+import hmac
 import json
+import zlib
 import base64
-import boto3
-from boto3.dynamodb.conditions import Key
+import hashlib
+from datetime import date
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 
-dynamodb = boto3.resource("dynamodb", region_name="eu-west-2")
-table = dynamodb.Table("New_Fashion_Analysis")
+import boto3
+from boto3.dynamodb.conditions import ConditionExpressionBuilder, Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+
+try:
+    import orjson  # optional: faster JSON serialisation if bundled in the deployment package
+except ImportError:
+    orjson = None
+
+# Created once per container: keep-alive connections are reused across warm invocations
+BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=16,  # one per parallel GSI query (MAX_QUERY_WORKERS)
+    retries={"mode": "adaptive", "total_max_attempts": 4},
+)
+TABLE_NAME = "New_Fashion_Analysis"
+# Reads go through a plain low-level client, which is thread-safe. boto3 resources
+# (and their Table objects, whose client shares one condition builder) are not
+client = boto3.client("dynamodb", region_name="eu-west-2", config=BOTO_CONFIG)
+_serialize = TypeSerializer().serialize
+_deserialize = TypeDeserializer().deserialize
 
 MAX_LIMIT = 500
 DEFAULT_LIMIT = 200
+MAX_FILTER_VALUES = 20  # per parameter, bounds the size of the OR chains
+MAX_QUERY_WORKERS = 16  # parallel GSI queries for multi-designer/season requests
+SCAN_SEGMENTS = 4       # parallel scan segments for season-only requests
+
+DESIGNER_SEASON_INDEX = "DesignerSeasonIndex"
+
+# Key attributes per read path, used to resume right after the last returned item
+TABLE_KEY = ("image_id",)
+DESIGNER_SEASON_KEY = TABLE_KEY + ("designer_lower", "season_lower")
+
+# Only the attributes the API returns (plus index keys) are read back from DynamoDB
+RESULT_ATTRIBUTES = [
+    "image_id", "original_image_name", "designer", "collection", "season", "event",
+    "runway_date", "item_name", "materials", "color_hex", "color_name",
+    "designer_lower", "season_lower",
+]
+# Every read and filter refers to these attributes through #aN placeholders,
+# so no attribute name can clash with a DynamoDB reserved word
+ATTR_NAMES = {name: f"#a{i}" for i, name in enumerate(RESULT_ATTRIBUTES)}
+PROJECTION_KWARGS = {
+    "ProjectionExpression": ", ".join(ATTR_NAMES.values()),
+    "ExpressionAttributeNames": {alias: name for name, alias in ATTR_NAMES.items()},
+}
+MAX_PAGE_SIZE = 1000
+FILTER_OVERFETCH = 4  # filtered pages read more rows than needed, since some get dropped
+
+# Secret used to sign next_token cursors so clients can't forge a start key.
+# Set it in the function's environment: without it responses carry no
+# next_token, so clients only ever get the first page of results.
+CURSOR_KEY = os.environ.get("CURSOR_KEY", "").encode("utf-8")
+CURSOR_TAG_BYTES = 16
 
 
 def parse_multi(params, key):
-    """Parse a comma-separated query param into a list of lowercase strings."""
+    """Parse a comma-separated query param into a de-duplicated list of lowercase strings."""
     raw = params.get(key, "").strip()
-    return [v.strip().lower() for v in raw.split(",") if v.strip()] if raw else []
+    return list(dict.fromkeys(v.strip().lower() for v in raw.split(",") if v.strip())) if raw else []
 
 
 def season_variants(season: str):
@@ -31,16 +88,303 @@ def build_or_filter(field, values, prefix):
     Build a DynamoDB FilterExpression fragment for OR contains across multiple values.
     Returns (expression_str, attr_values_dict).
     """
+    name = ATTR_NAMES.get(field, field)
     conditions = []
     attr_values = {}
     for i, v in enumerate(values):
         k = f":{prefix}{i}"
         attr_values[k] = v
-        conditions.append(f"contains({field}, {k})")
+        conditions.append(f"contains({name}, {k})")
     expr = f"({' OR '.join(conditions)})"
     return expr, attr_values
 
 
+def encode_cursor(last_evaluated_key):
+    """
+    Compact, signed next_token: urlsafe base64 of HMAC tag + zlib(JSON).
+    Returns None when CURSOR_KEY is not set, since the token couldn't be verified.
+    """
+    if not CURSOR_KEY:
+        print("WARNING: CURSOR_KEY is not set; returning the page without a next_token")
+        return None
+    body = zlib.compress(
+        json.dumps(last_evaluated_key, separators=(",", ":"), default=str).encode("utf-8")
+    )
+    tag = hmac.new(CURSOR_KEY, body, hashlib.sha256).digest()[:CURSOR_TAG_BYTES]
+    return base64.urlsafe_b64encode(tag + body).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token):
+    """Verify and decode a next_token. Raises ValueError if it was tampered with."""
+    if not CURSOR_KEY:
+        raise ValueError("CURSOR_KEY is not set, so no next_token can be valid")
+    raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    tag, body = raw[:CURSOR_TAG_BYTES], raw[CURSOR_TAG_BYTES:]
+    expected = hmac.new(CURSOR_KEY, body, hashlib.sha256).digest()[:CURSOR_TAG_BYTES]
+    if not hmac.compare_digest(tag, expected):
+        raise ValueError("cursor signature mismatch")
+    return json.loads(zlib.decompress(body))
+
+
+def _designer_key(designer):
+    """KeyConditionExpression on the DesignerSeasonIndex partition key."""
+    return Key("designer_lower").eq(designer)
+
+
+def _designer_season_key(designer, season):
+    """KeyConditionExpression on both DesignerSeasonIndex keys."""
+    return _designer_key(designer) & Key("season_lower").eq(season)
+
+
+def _wire(values):
+    """Plain Python values -> DynamoDB attribute values"""
+    return {k: _serialize(v) for k, v in values.items()}
+
+
+def _unwire(item):
+    """DynamoDB attribute values -> plain Python values, as the Table resource returns them"""
+    return {k: _deserialize(v) for k, v in item.items()}
+
+
+def _client_op(name):
+    """
+    Table.<name> equivalent on the low-level client: the same plain-value kwargs
+    (Key conditions included) in, plain-value Items and LastEvaluatedKey out, so
+    cursors keep their format. Each call builds its own key condition.
+    """
+    call = getattr(client, name)
+
+    def op(**kwargs):
+        kwargs = dict(kwargs, TableName=TABLE_NAME)
+        values = dict(kwargs.pop("ExpressionAttributeValues", {}))
+        condition = kwargs.get("KeyConditionExpression")
+        if condition is not None:
+            built = ConditionExpressionBuilder().build_expression(condition, is_key_condition=True)
+            kwargs["KeyConditionExpression"] = built.condition_expression
+            kwargs["ExpressionAttributeNames"] = {
+                **kwargs.get("ExpressionAttributeNames", {}), **built.attribute_name_placeholders
+            }
+            values.update(built.attribute_value_placeholders)
+        if values:
+            kwargs["ExpressionAttributeValues"] = _wire(values)
+        if kwargs.get("ExclusiveStartKey"):
+            kwargs["ExclusiveStartKey"] = _wire(kwargs["ExclusiveStartKey"])
+        res = call(**kwargs)
+        page = {"Items": [_unwire(item) for item in res.get("Items", [])]}
+        if res.get("LastEvaluatedKey"):
+            page["LastEvaluatedKey"] = _unwire(res["LastEvaluatedKey"])
+        return page
+
+    return op
+
+
+query = _client_op("query")
+scan = _client_op("scan")
+
+
+def _filter_kwargs(filter_parts, expr_attr_values):
+    """Projection + FilterExpression kwargs for a query/scan."""
+    if not filter_parts:
+        return dict(PROJECTION_KWARGS)
+    return {
+        **PROJECTION_KWARGS,
+        "FilterExpression": " AND ".join(filter_parts),
+        "ExpressionAttributeValues": expr_attr_values,
+    }
+
+
+def _resume_key(item, key_attrs):
+    """ExclusiveStartKey that resumes a read right after `item`."""
+    return {k: item[k] for k in key_attrs}
+
+
+def _iter_pages(op, kwargs, needed, key_attrs, state, claim=None):
+    """
+    Yield items from a DynamoDB query/scan page by page, stopping exactly at `needed`.
+    Each call asks only for the rows still needed (more when a FilterExpression may
+    drop some). state["last_evaluated_key"] is left where the next request should
+    resume, or None once the results are exhausted.
+    `claim(count)` reports each page to a shared counter and returns False once
+    enough rows have been collected across all callers.
+    """
+    state["last_evaluated_key"] = None
+    overfetch = FILTER_OVERFETCH if "FilterExpression" in kwargs else 1
+    while needed > 0:
+        kwargs["Limit"] = min(needed * overfetch, MAX_PAGE_SIZE)
+        res = op(**kwargs)
+        page = res.get("Items", [])
+        state["last_evaluated_key"] = res.get("LastEvaluatedKey")
+        for i, item in enumerate(page, 1):
+            yield item
+            needed -= 1
+            if not needed:
+                if i < len(page):  # stopped mid-page: resume right after this item
+                    state["last_evaluated_key"] = _resume_key(item, key_attrs)
+                return
+        if claim and not claim(len(page)):
+            return
+        if not state["last_evaluated_key"]:
+            return
+        kwargs["ExclusiveStartKey"] = state["last_evaluated_key"]
+
+
+def _paginate(op, kwargs, limit, key_attrs, claim=None):
+    """Collect up to `limit` items from a query/scan. Returns (items, last_evaluated_key)."""
+    state = {}
+    items = list(_iter_pages(op, kwargs, limit, key_attrs, state, claim))
+    return items, state["last_evaluated_key"]
+
+
+def _query_designer_season(designer, season, filter_kwargs, exclusive_start_key, limit, claim=None):
+    """
+    Single designer + single season → GSI (most efficient).
+    Season formats are tried in turn, moving on only once a format is exhausted
+    without results; a cursor resumes the format it was read from (its season_lower).
+    """
+    variants = season_variants(season)
+    if exclusive_start_key and exclusive_start_key.get("season_lower") in variants:
+        variants = variants[variants.index(exclusive_start_key["season_lower"]):]
+
+    items, last_evaluated_key = [], None
+    for season_val in variants:
+        query_kwargs = {
+            "IndexName": DESIGNER_SEASON_INDEX,
+            "KeyConditionExpression": _designer_season_key(designer, season_val),
+            **filter_kwargs,
+        }
+        if exclusive_start_key and exclusive_start_key.get("season_lower") == season_val:
+            query_kwargs["ExclusiveStartKey"] = exclusive_start_key
+
+        items, last_evaluated_key = _paginate(
+            query, query_kwargs, limit, DESIGNER_SEASON_KEY, claim
+        )
+        # Stopped before the end of this format (page or shared budget): its cursor
+        # must survive, even with no items yet, or the rest of it would be skipped
+        if items or last_evaluated_key:
+            break
+    return items, last_evaluated_key
+
+
+def _query_designer(designer, filter_kwargs, exclusive_start_key, limit, claim=None):
+    """GSI PK only — all seasons for one designer."""
+    query_kwargs = {
+        "IndexName": DESIGNER_SEASON_INDEX,
+        "KeyConditionExpression": _designer_key(designer),
+        **filter_kwargs,
+    }
+    if exclusive_start_key:
+        query_kwargs["ExclusiveStartKey"] = exclusive_start_key
+    return _paginate(query, query_kwargs, limit, DESIGNER_SEASON_KEY, claim)
+
+
+def _shared_counter(limit):
+    """claim() callback shared by parallel readers: False once `limit` rows are in overall."""
+    lock = Lock()
+    total = 0
+
+    def claim(count):
+        nonlocal total
+        with lock:
+            total += count
+            return total < limit
+
+    return claim
+
+
+def _merge_parts(keys, results, cursors, limit, key_attrs):
+    """
+    Merge parallel reads in `keys` order, cutting exactly at `limit`.
+    Returns (items, next_cursors) where next_cursors maps each part that still
+    has rows to where it should resume.
+    """
+    items = []
+    next_cursors = {}
+    for key, (part_items, lek) in zip(keys, results):
+        room = limit - len(items)
+        if room <= 0:
+            # Nothing of this part is returned: next page starts where this one did
+            if part_items or lek:
+                next_cursors[key] = cursors[key]
+        elif len(part_items) > room:
+            items.extend(part_items[:room])
+            next_cursors[key] = _resume_key(part_items[room - 1], key_attrs)
+        else:
+            items.extend(part_items)
+            if lek:
+                next_cursors[key] = lek
+    return items, next_cursors
+
+
+def _query_designers(designers, seasons, filter_parts, expr_attr_values, exclusive_start_key, limit):
+    """
+    Multiple designers and/or seasons → one GSI query per (designer, season) pair
+    (per designer when no season is given), run in parallel and merged in request
+    order up to `limit`. Seasons can't be OR-filtered on a Query since season_lower
+    is the index sort key. The cursor maps each "designer|season" that still has
+    rows to where it should resume (None = from the start).
+    """
+    parts = [(d, s) for d in designers for s in (seasons or [""])]
+    part_keys = [f"{d}|{s}" for d, s in parts]
+    cursors = exclusive_start_key["parts"] if exclusive_start_key else dict.fromkeys(part_keys)
+    pending = [(key, part) for key, part in zip(part_keys, parts) if key in cursors]
+    if not pending:
+        return [], None
+
+    filter_kwargs = _filter_kwargs(filter_parts, expr_attr_values)
+    claim = _shared_counter(limit)
+
+    def run(pending_part):
+        key, (designer, season) = pending_part
+        if season:
+            return _query_designer_season(
+                designer, season, filter_kwargs, cursors[key], limit, claim
+            )
+        return _query_designer(designer, filter_kwargs, cursors[key], limit, claim)
+
+    with ThreadPoolExecutor(max_workers=min(len(pending), MAX_QUERY_WORKERS)) as pool:
+        results = list(pool.map(run, pending))
+
+    keys = [key for key, _ in pending]
+    items, next_cursors = _merge_parts(keys, results, cursors, limit, DESIGNER_SEASON_KEY)
+    return items, ({"parts": next_cursors} if next_cursors else None)
+
+
+def _scan(seasons, filter_parts, expr_attr_values, exclusive_start_key, limit):
+    """
+    Scan path — season-only or attribute-only requests (no designer to key on).
+    Runs as a parallel scan of SCAN_SEGMENTS segments; the cursor maps each segment
+    that still has rows to where it should resume (None = from the start).
+    """
+    filter_parts = list(filter_parts)
+    expr_attr_values = dict(expr_attr_values)
+
+    if seasons:
+        expr, vals = build_or_filter("season_lower", seasons, "sea")
+        filter_parts.append(expr)
+        expr_attr_values.update(vals)
+
+    scan_kwargs = _filter_kwargs(filter_parts, expr_attr_values)
+    segment_keys = [str(segment) for segment in range(SCAN_SEGMENTS)]
+    cursors = exclusive_start_key["segments"] if exclusive_start_key else dict.fromkeys(segment_keys)
+    pending = [key for key in segment_keys if key in cursors]
+    if not pending:
+        return [], None
+
+    claim = _shared_counter(limit)
+
+    def run(key):
+        segment_kwargs = {**scan_kwargs, "Segment": int(key), "TotalSegments": SCAN_SEGMENTS}
+        if cursors[key]:
+            segment_kwargs["ExclusiveStartKey"] = cursors[key]
+        return _paginate(scan, segment_kwargs, limit, TABLE_KEY, claim)
+
+    with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+        results = list(pool.map(run, pending))
+
+    items, next_cursors = _merge_parts(pending, results, cursors, limit, TABLE_KEY)
+    return items, ({"segments": next_cursors} if next_cursors else None)
+
+
 def lambda_handler(event, context):
     try:
         params = event.get("queryStringParameters") or {}
@@ -60,6 +404,9 @@ def lambda_handler(event, context):
         if not any([designers, seasons, colors, item_names, materials]):
             return response(400, {"error": "At least one filter is required"})
 
+        if max(map(len, [designers, seasons, colors, item_names, materials])) > MAX_FILTER_VALUES:
+            return response(400, {"error": f"At most {MAX_FILTER_VALUES} values per filter"})
+
         # Build FilterExpression parts for color / item / material (always OR-across-values)
         filter_parts = []
         expr_attr_values = {}
@@ -69,6 +416,8 @@ def lambda_handler(event, context):
             filter_parts.append(expr)
             expr_attr_values.update(vals)
 
+        # item_name always matches as a substring ("jacket" finds "leather jacket"),
+        # which a sort-key condition can't express, so it stays a filter on every path
         if item_names:
             expr, vals = build_or_filter("item_name", item_names, "item")
             filter_parts.append(expr)
@@ -83,102 +432,39 @@ def lambda_handler(event, context):
         exclusive_start_key = None
         if next_token:
             try:
-                exclusive_start_key = json.loads(base64.b64decode(next_token).decode("utf-8"))
+                exclusive_start_key = decode_cursor(next_token)
             except Exception:
                 return response(400, {"error": "Invalid next_token"})
 
-        items = []
-        last_evaluated_key = None
+        filter_kwargs = _filter_kwargs(filter_parts, expr_attr_values)
 
-        # Route: single designer + single season → GSI (most efficient)
         if len(designers) == 1 and len(seasons) == 1:
-            for season_val in season_variants(seasons[0]):
-                query_kwargs = {
-                    "IndexName": "DesignerSeasonIndex",
-                    "KeyConditionExpression": (
-                        Key("designer_lower").eq(designers[0]) &
-                        Key("season_lower").eq(season_val)
-                    ),
-                }
-                if filter_parts:
-                    query_kwargs["FilterExpression"] = " AND ".join(filter_parts)
-                    query_kwargs["ExpressionAttributeValues"] = expr_attr_values
-                if exclusive_start_key:
-                    query_kwargs["ExclusiveStartKey"] = exclusive_start_key
-
-                while len(items) < limit:
-                    res = table.query(**query_kwargs)
-                    items.extend(res.get("Items", []))
-                    last_evaluated_key = res.get("LastEvaluatedKey")
-                    if not last_evaluated_key or len(items) >= limit:
-                        break
-                    query_kwargs["ExclusiveStartKey"] = last_evaluated_key
-
-                if items:
-                    break  # found results with this season format, stop trying
-
+            items, last_evaluated_key = _query_designer_season(
+                designers[0], seasons[0], filter_kwargs, exclusive_start_key, limit
+            )
         elif len(designers) == 1 and len(seasons) == 0:
-            # GSI PK only — all seasons for one designer
-            query_kwargs = {
-                "IndexName": "DesignerSeasonIndex",
-                "KeyConditionExpression": Key("designer_lower").eq(designers[0]),
-            }
-            if filter_parts:
-                query_kwargs["FilterExpression"] = " AND ".join(filter_parts)
-                query_kwargs["ExpressionAttributeValues"] = expr_attr_values
-            if exclusive_start_key:
-                query_kwargs["ExclusiveStartKey"] = exclusive_start_key
-
-            while len(items) < limit:
-                res = table.query(**query_kwargs)
-                items.extend(res.get("Items", []))
-                last_evaluated_key = res.get("LastEvaluatedKey")
-                if not last_evaluated_key or len(items) >= limit:
-                    break
-                query_kwargs["ExclusiveStartKey"] = last_evaluated_key
-
+            items, last_evaluated_key = _query_designer(
+                designers[0], filter_kwargs, exclusive_start_key, limit
+            )
+        elif designers:
+            items, last_evaluated_key = _query_designers(
+                designers, seasons, filter_parts, expr_attr_values, exclusive_start_key, limit
+            )
         else:
-            # Scan path — multiple designers, multiple seasons, or season-only
-            scan_filter_parts = list(filter_parts)
-            scan_expr_values = dict(expr_attr_values)
-
-            if designers:
-                expr, vals = build_or_filter("designer_lower", designers, "des")
-                scan_filter_parts.append(expr)
-                scan_expr_values.update(vals)
-
-            if seasons:
-                expr, vals = build_or_filter("season_lower", seasons, "sea")
-                scan_filter_parts.append(expr)
-                scan_expr_values.update(vals)
-
-            scan_kwargs = {}
-            if scan_filter_parts:
-                scan_kwargs["FilterExpression"] = " AND ".join(scan_filter_parts)
-                scan_kwargs["ExpressionAttributeValues"] = scan_expr_values
-            if exclusive_start_key:
-                scan_kwargs["ExclusiveStartKey"] = exclusive_start_key
-
-            while len(items) < limit:
-                res = table.scan(**scan_kwargs)
-                items.extend(res.get("Items", []))
-                last_evaluated_key = res.get("LastEvaluatedKey")
-                if not last_evaluated_key or len(items) >= limit:
-                    break
-                scan_kwargs["ExclusiveStartKey"] = last_evaluated_key
-
-        result_items = items[:limit]
-        encoded_next_token = None
+            items, last_evaluated_key = _scan(
+                seasons, filter_parts, expr_attr_values, exclusive_start_key, limit
+            )
 
-        if last_evaluated_key and (len(items) >= limit or len(items) == limit):
-            encoded_next_token = base64.b64encode(
-                json.dumps(last_evaluated_key, default=str).encode("utf-8")
-            ).decode("utf-8")
+        # Reads stop exactly at `limit`, so any remaining key means there is a next page
+        encoded_next_token = None
+        if last_evaluated_key:
+            encoded_next_token = encode_cursor(last_evaluated_key)
 
         return response(200, {
-            "items": result_items,
+            # Projected attributes are strings; any Decimal is converted by _json_default
+            "items": items,
             "next_token": encoded_next_token,
-            "count": len(result_items),
+            "count": len(items),
         })
 
     except Exception as e:
@@ -186,6 +472,24 @@ def lambda_handler(event, context):
         return response(500, {"error": str(e)})
 
 
+def _json_default(o):
+    """Fallback for values json/orjson can't encode: Decimal as a number, dates as ISO."""
+    if isinstance(o, Decimal):
+        return int(o) if o == o.to_integral_value() else float(o)
+    if isinstance(o, date):
+        return o.isoformat()
+    return str(o)
+
+
+class _JSONEncoder(json.JSONEncoder):
+    def default(self, o):
+        return _json_default(o)
+
+
+# Built once: compact separators, no \u escaping of non-ASCII names
+_dump_json = _JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
 def response(status, body):
     return {
         "statusCode": status,
@@ -194,5 +498,5 @@ def response(status, body):
             "Access-Control-Allow-Headers": "*",
             "Content-Type": "application/json",
         },
-        "body": json.dumps(body, default=str),
+        "body": orjson.dumps(body, default=_json_default).decode() if orjson else _dump_json(body),
     }
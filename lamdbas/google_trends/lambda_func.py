@@ -1,160 +1,37 @@
+import gzip
 import json
 import boto3
-import time
-import datetime
-from pytrends.request import TrendReq
+import re
 from botocore.exceptions import ClientError
 
-RUNWAY_BUCKET = "runwayimages"
+try:
+    import orjson  # optional: faster JSON serialisation if bundled in the deployment package
+except ImportError:
+    orjson = None
+
+# Read-only view of the trends cache; the trendsRefresher lambda rebuilds it on a schedule
 CACHE_BUCKET = "fashion-trends-cache"
 CACHE_KEY = "designer_trends.json"
-CACHE_TTL_HOURS = 24
 REGION = "eu-west-2"
 
+# Designer names accepted in ?designer= (they are quoted into an S3 Select expression)
+DESIGNER_PARAM_RE = re.compile(r"^[a-z0-9 &.'-]+$")
+
 s3 = boto3.client("s3", region_name=REGION)
 
 
 def get_cached_data():
-    """Return parsed JSON from S3 if fresh (< CACHE_TTL_HOURS old), else None."""
+    """Return the parsed trends payload from S3 whatever its age, or None if missing."""
     try:
         obj = s3.get_object(Bucket=CACHE_BUCKET, Key=CACHE_KEY)
-        data = json.loads(obj["Body"].read())
-        updated_at = datetime.datetime.fromisoformat(
-            data["updated_at"].replace("Z", "+00:00")
-        )
-        age_hours = (
-            datetime.datetime.now(tz=datetime.timezone.utc) - updated_at
-        ).total_seconds() / 3600
-        if age_hours < CACHE_TTL_HOURS:
-            return data
-        return None
     except ClientError as e:
         if e.response["Error"]["Code"] == "NoSuchKey":
             return None
         raise
-
-
-def get_designers_from_s3():
-    """
-    List folders in the runwayimages bucket and extract unique brand names
-    using the same parsing logic as the lists3Folder lambda.
-    Returns a sorted list of lowercase brand name strings.
-    """
-    response = s3.list_objects_v2(Bucket=RUNWAY_BUCKET, Delimiter="/")
-    folders = [
-        prefix["Prefix"].rstrip("/")
-        for prefix in response.get("CommonPrefixes", [])
-    ]
-
-    brands = set()
-    for folder in folders:
-        parts = folder.split("-")
-        ready_index = next(
-            (i for i, p in enumerate(parts) if "ready" in p), None
-        )
-        if ready_index:
-            brand = " ".join(parts[:ready_index])
-        else:
-            brand = " ".join(parts[:2])
-        brand = brand.replace("-", " ").strip().lower()
-        if brand:
-            brands.add(brand)
-
-    return sorted(brands)
-
-
-def fetch_trends_for_designers(designers):
-    """
-    Query Google Trends for each designer (in batches of 5).
-    Timeframe: last 5 years, worldwide.
-    Returns: { "chanel": [{"date": "2021-02", "value": 72}, ...], ... }
-    """
-    results = {}
-    batches = [designers[i : i + 5] for i in range(0, len(designers), 5)]
-
-    pytrends = TrendReq(
-        hl="en-US",
-        tz=0,
-        timeout=(10, 25),
-        retries=2,
-        backoff_factor=2,
-        requests_args={"verify": True},
-    )
-
-    for batch in batches:
-        attempt = 0
-        max_attempts = 5
-        base_delay = 5
-
-        while attempt < max_attempts:
-            try:
-                pytrends.build_payload(
-                    batch,
-                    cat=0,
-                    timeframe="today 5-y",
-                    geo="",
-                    gprop="",
-                )
-                interest_df = pytrends.interest_over_time()
-
-                if interest_df.empty:
-                    for keyword in batch:
-                        results[keyword] = []
-                    break
-
-                if "isPartial" in interest_df.columns:
-                    interest_df = interest_df.drop(columns=["isPartial"])
-
-                for keyword in batch:
-                    if keyword in interest_df.columns:
-                        series = interest_df[keyword]
-                        results[keyword] = [
-                            {
-                                "date": str(idx)[:7],  # "YYYY-MM"
-                                "value": int(val),
-                            }
-                            for idx, val in series.items()
-                        ]
-                    else:
-                        results[keyword] = []
-
-                # Polite delay between batches
-                time.sleep(2)
-                break
-
-            except Exception as e:
-                error_str = str(e).lower()
-                is_rate_limit = (
-                    "429" in error_str
-                    or "too many" in error_str
-                    or "response" in error_str
-                    or "quota" in error_str
-                )
-                attempt += 1
-                if is_rate_limit and attempt < max_attempts:
-                    # Exponential backoff with jitter
-                    wait = base_delay * (2 ** attempt) + (time.time() % 1)
-                    print(
-                        f"[GoogleTrends] Rate limited on batch {batch}, "
-                        f"retrying in {wait:.1f}s (attempt {attempt}/{max_attempts})"
-                    )
-                    time.sleep(wait)
-                else:
-                    print(f"[GoogleTrends] Error for batch {batch}: {e}")
-                    for keyword in batch:
-                        results.setdefault(keyword, [])
-                    break
-
-    return results
-
-
-def save_to_s3(data):
-    s3.put_object(
-        Bucket=CACHE_BUCKET,
-        Key=CACHE_KEY,
-        Body=json.dumps(data, default=str),
-        ContentType="application/json",
-    )
+    raw = obj["Body"].read()
+    if obj.get("ContentEncoding") == "gzip":
+        raw = gzip.decompress(raw)
+    return orjson.loads(raw) if orjson else json.loads(raw)
 
 
 def build_response(status_code, body):
@@ -166,41 +43,58 @@ def build_response(status_code, body):
             "Access-Control-Allow-Headers": "Content-Type",
             "Content-Type": "application/json",
         },
-        "body": json.dumps(body, default=str),
+        "body": orjson.dumps(body, default=str).decode() if orjson else json.dumps(body, default=str),
     }
 
 
-def lambda_handler(event, context):
+def select_designer(designer):
+    """
+    Read one designer's trend series from the cache with S3 Select, so only that
+    slice leaves S3. Returns {"updated_at": ..., "designers": {designer: [...]}}.
+    Falls back to the full object if the cache can't be selected from.
+    """
     try:
-        # 1. Serve from cache if fresh
-        cached = get_cached_data()
-        if cached:
-            print(f"[GoogleTrends] Serving {len(cached.get('designers', {}))} designers from cache")
-            return build_response(200, cached)
-
-        # 2. Get designer list from S3 runway folders
-        print("[GoogleTrends] Cache miss or stale — rebuilding")
-        designers = get_designers_from_s3()
-        print(f"[GoogleTrends] Found {len(designers)} unique designers: {designers}")
+        res = s3.select_object_content(
+            Bucket=CACHE_BUCKET,
+            Key=CACHE_KEY,
+            ExpressionType="SQL",
+            Expression=f'SELECT s.updated_at, s.designers."{designer}" AS points FROM S3Object s',
+            InputSerialization={"JSON": {"Type": "DOCUMENT"}, "CompressionType": "GZIP"},
+            OutputSerialization={"JSON": {}},
+        )
+        raw = b"".join(e["Records"]["Payload"] for e in res["Payload"] if "Records" in e)
+        record = orjson.loads(raw) if orjson else json.loads(raw)
+        return {
+            "updated_at": record.get("updated_at"),
+            "designers": {designer: record.get("points") or []},
+        }
+    except ClientError as e:
+        # e.g. an uncompressed object written before gzip, or S3 Select unavailable
+        print(f"[GoogleTrends] S3 Select failed, reading full cache: {e}")
+        cached = get_cached_data() or {}
+        return {
+            "updated_at": cached.get("updated_at"),
+            "designers": {designer: cached.get("designers", {}).get(designer, [])},
+        }
 
-        if not designers:
-            return build_response(200, {
-                "updated_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
-                "designers": {},
-            })
 
-        # 3. Fetch from Google Trends
-        trends_data = fetch_trends_for_designers(designers)
+def lambda_handler(event, context):
+    try:
+        params = (event or {}).get("queryStringParameters") or {}
+        designer = params.get("designer", "").strip().lower()
+        if designer and not DESIGNER_PARAM_RE.match(designer):
+            return build_response(400, {"error": "Invalid designer"})
 
-        # 4. Build and save payload
-        payload = {
-            "updated_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
-            "designers": trends_data,
-        }
-        save_to_s3(payload)
-        print(f"[GoogleTrends] Saved {len(trends_data)} designers to S3")
+        # Single designer: only that slice is read from S3
+        if designer:
+            return build_response(200, select_designer(designer))
 
-        return build_response(200, payload)
+        # Serve whatever the refresher last wrote; updated_at lets clients show its age
+        cached = get_cached_data()
+        if cached is None:
+            return build_response(503, {"error": "Trends not available yet"})
+        print(f"[GoogleTrends] Serving {len(cached.get('designers', {}))} designers from cache")
+        return build_response(200, cached)
 
     except Exception as e:
         print(f"[GoogleTrends] FATAL: {e}")
@@ -5,37 +5,38 @@ import re
 s3 = boto3.client("s3")
 BUCKET = "runwayimages"
 
-def lambda_handler(event, context):
-    response = s3.list_objects_v2(Bucket=BUCKET, Delimiter='/')
-    folders = [prefix["Prefix"].rstrip("/") for prefix in response.get("CommonPrefixes", [])]
-    
-    folder_map = {}
-
-    for folder in folders:
-        # Example folder: "chanel-ready-to-wear-fall-winter-2025-paris"
-        parts = folder.split("-")
+# Example folder: "chanel-ready-to-wear-fall-winter-2025-paris"
+FOLDER_RE = re.compile(r"^(?P<brand>[a-z0-9\-]+?)-ready-to-wear-(?P<season>.+)$", re.IGNORECASE)
 
-        # Find the index where "ready" or "readyto" appears — start of "ready-to-wear"
-        ready_index = next((i for i, p in enumerate(parts) if "ready" in p), None)
 
-        if ready_index:
-            # Brand = everything before "ready"
-            brand = " ".join(parts[:ready_index])
-        else:
-            # If "ready" not found, take the first two words as brand fallback
-            brand = " ".join(parts[:2])
+def parse_folder(folder):
+    """Split a runway folder name into (brand, season), both lowercase."""
+    match = FOLDER_RE.match(folder)
+    if match:
+        # Brand = everything before "ready-to-wear", season = everything after
+        brand = match["brand"].replace("-", " ")
+        season = match["season"]
+    else:
+        # If "ready-to-wear" not found, take the first two words as brand fallback
+        parts = folder.split("-", 2)
+        brand = " ".join(parts[:2])
+        season = parts[2] if len(parts) > 2 else ""
+    return brand.strip().lower(), season.strip().lower()
 
-        # Season = everything after "ready-to-wear"
-        season_parts = parts[ready_index + 3:] if ready_index is not None else parts[2:]
-        season = "-".join(season_parts)
 
-        brand = brand.replace("-", " ").strip().lower()
-        season = season.strip().lower()
+def lambda_handler(event, context):
+    paginator = s3.get_paginator("list_objects_v2")
+    folders = [
+        prefix["Prefix"].rstrip("/")
+        for page in paginator.paginate(Bucket=BUCKET, Delimiter="/")
+        for prefix in page.get("CommonPrefixes", [])
+    ]
 
-        if brand not in folder_map:
-            folder_map[brand] = {}
+    folder_map = {}
 
-        folder_map[brand][season] = folder
+    for folder in folders:
+        brand, season = parse_folder(folder)
+        folder_map.setdefault(brand, {})[season] = folder
 
     return {
     "statusCode": 200,
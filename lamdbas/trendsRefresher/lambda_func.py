@@ -0,0 +1,378 @@
+"""
+Scheduled refresher for the Google Trends cache.
+
+Triggered by an EventBridge rule (rate(12 hours)); fetches 5 years of Google
+Trends interest for every runway designer and writes the gzip JSON payload
+that the google_trends lambda serves. Designers whose batch fails keep their
+previous series; the failure is then raised, not swallowed, so a CloudWatch
+alarm on this function's Errors metric catches failed refreshes. A refresh in
+which every batch fails writes nothing, so the last good payload is kept.
+
+google_trends/fetch_and_upload.py runs this same refresh from a local machine.
+"""
+
+import os
+import gzip
+import json
+import boto3
+import time
+import random
+import datetime
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pytrends.request import TrendReq
+from botocore.exceptions import ClientError
+
+try:
+    import orjson  # optional: faster JSON serialisation if bundled in the deployment package
+except ImportError:
+    orjson = None
+
+RUNWAY_BUCKET = "runwayimages"
+CACHE_BUCKET = "fashion-trends-cache"
+CACHE_KEY = "designer_trends.json"
+DESIGNERS_KEY = "designers.json"  # brand list cached by get_designers_from_s3
+DESIGNERS_TTL_DAYS = 7
+REGION = "eu-west-2"
+
+# Google Trends pacing: two batches in flight, sharing one request budget
+TRENDS_WORKERS = 2
+TRENDS_REQUESTS_PER_MINUTE = 20  # same pace as the old 2-3s delay between batches
+TRENDS_BURST = 2
+BROWSER_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# Optional egress proxies (comma-separated), since Google throttles AWS IP ranges hard
+PROXIES = [p.strip() for p in os.environ.get("PYTRENDS_PROXIES", "").split(",") if p.strip()]
+PROXY_MAX_FAILURES = 3        # consecutive rate limits before a proxy is benched
+PROXY_COOLDOWN_SECONDS = 300
+
+s3 = boto3.client("s3", region_name=REGION)
+
+# Same folder parser as the lists3Folder lambda
+FOLDER_RE = re.compile(r"^(?P<brand>[a-z0-9\-]+?)-ready-to-wear-(?P<season>.+)$", re.IGNORECASE)
+
+
+def get_object_age(key):
+    """Age of a cache object from a HEAD request (no body download), or None if missing."""
+    try:
+        head = s3.head_object(Bucket=CACHE_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+    return datetime.datetime.now(tz=datetime.timezone.utc) - head["LastModified"]
+
+
+def parse_folder(folder):
+    """Split a runway folder name into (brand, season), both lowercase."""
+    match = FOLDER_RE.match(folder)
+    if match:
+        # Brand = everything before "ready-to-wear", season = everything after
+        brand = match["brand"].replace("-", " ")
+        season = match["season"]
+    else:
+        # If "ready-to-wear" not found, take the first two words as brand fallback
+        parts = folder.split("-", 2)
+        brand = " ".join(parts[:2])
+        season = parts[2] if len(parts) > 2 else ""
+    return brand.strip().lower(), season.strip().lower()
+
+
+def get_cached_designers():
+    """Return the brand list saved by get_designers_from_s3 if fresh (< DESIGNERS_TTL_DAYS old), else None."""
+    age = get_object_age(DESIGNERS_KEY)
+    if age is None or age > datetime.timedelta(days=DESIGNERS_TTL_DAYS):
+        return None
+    obj = s3.get_object(Bucket=CACHE_BUCKET, Key=DESIGNERS_KEY)
+    raw = obj["Body"].read()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+
+def get_designers_from_s3():
+    """
+    Return a sorted list of lowercase brand names. Uses the cached list when
+    fresh, otherwise lists the folders in the runwayimages bucket, parses them
+    the same way as the lists3Folder lambda, and caches the result.
+    """
+    cached = get_cached_designers()
+    if cached is not None:
+        return cached
+
+    paginator = s3.get_paginator("list_objects_v2")
+    brands = set()
+    for page in paginator.paginate(Bucket=RUNWAY_BUCKET, Delimiter="/"):
+        for prefix in page.get("CommonPrefixes", []):
+            brand, _ = parse_folder(prefix["Prefix"].rstrip("/"))
+            if brand:
+                brands.add(brand)
+
+    designers = sorted(brands)
+    try:
+        s3.put_object(
+            Bucket=CACHE_BUCKET,
+            Key=DESIGNERS_KEY,
+            Body=orjson.dumps(designers) if orjson else json.dumps(designers),
+            ContentType="application/json",
+        )
+    except ClientError as e:
+        # Only a cache: the next refresh lists the bucket again
+        print(f"[TrendsRefresher] Could not cache the designer list: {e}")
+    return designers
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until another request may be sent."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate  # tokens per second
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+trends_bucket = TokenBucket(rate=TRENDS_REQUESTS_PER_MINUTE / 60, burst=TRENDS_BURST)
+_thread_local = threading.local()
+
+# Per-proxy health, kept across warm invocations
+_proxy_failures = {}       # proxy -> consecutive rate-limit failures
+_proxy_benched_until = {}  # proxy -> time.monotonic() when it may be used again
+_proxy_lock = threading.Lock()
+
+
+def healthy_proxies():
+    """Proxies not currently benched (all of them if every proxy is benched)."""
+    now = time.monotonic()
+    with _proxy_lock:
+        healthy = [p for p in PROXIES if _proxy_benched_until.get(p, 0) <= now]
+    return healthy or PROXIES
+
+
+def record_proxy_result(proxy, rate_limited):
+    """Track consecutive rate limits per proxy; bench it after PROXY_MAX_FAILURES."""
+    if not proxy:
+        return
+    with _proxy_lock:
+        if not rate_limited:
+            _proxy_failures[proxy] = 0
+            return
+        _proxy_failures[proxy] = _proxy_failures.get(proxy, 0) + 1
+        if _proxy_failures[proxy] >= PROXY_MAX_FAILURES:
+            _proxy_benched_until[proxy] = time.monotonic() + PROXY_COOLDOWN_SECONDS
+            _proxy_failures[proxy] = 0
+            print(f"[TrendsRefresher] Benching proxy {proxy} for {PROXY_COOLDOWN_SECONDS}s")
+
+
+def current_proxy(pytrends):
+    return pytrends.proxies[pytrends.proxy_index] if pytrends.proxies else None
+
+
+def refresh_proxies(pytrends):
+    """Swap the client's proxy list for the healthy ones if its current proxy is benched."""
+    proxy = current_proxy(pytrends)
+    if proxy and proxy not in healthy_proxies():
+        pytrends.proxies = healthy_proxies()
+        pytrends.proxy_index = 0
+
+
+def get_trend_client():
+    """
+    One TrendReq per worker thread — build_payload keeps per-instance state —
+    reused for every batch that thread handles so its Google cookies are kept.
+    """
+    if not hasattr(_thread_local, "pytrends"):
+        _thread_local.pytrends = TrendReq(
+            hl="en-US",
+            tz=0,
+            timeout=(10, 25),
+            retries=2,
+            backoff_factor=2,
+            proxies=healthy_proxies() or "",  # pytrends rotates through these on 429s
+            requests_args={"verify": True, "headers": BROWSER_HEADERS},
+        )
+    return _thread_local.pytrends
+
+
+def fetch_batch(batch):
+    """
+    Query Google Trends for one batch of up to 5 designers, with exponential
+    backoff on rate limits. Returns { keyword: [{"date", "value"}, ...] };
+    raises once the retries are exhausted or on a non-rate-limit error.
+    """
+    results = {}
+    pytrends = get_trend_client()
+    attempt = 0
+    max_attempts = 5
+    base_delay = 5
+
+    while attempt < max_attempts:
+        refresh_proxies(pytrends)
+        proxy = current_proxy(pytrends)
+        trends_bucket.acquire()
+        try:
+            pytrends.build_payload(
+                batch,
+                cat=0,
+                timeframe="today 5-y",
+                geo="",
+                gprop="",
+            )
+            interest_df = pytrends.interest_over_time()
+            record_proxy_result(proxy, rate_limited=False)
+
+            if interest_df.empty:
+                for keyword in batch:
+                    results[keyword] = []
+                break
+
+            if "isPartial" in interest_df.columns:
+                interest_df = interest_df.drop(columns=["isPartial"])
+
+            # Format dates and coerce values once for the whole frame
+            points = interest_df.astype(int).assign(
+                date=interest_df.index.strftime("%Y-%m")  # "YYYY-MM"
+            )
+            for keyword in batch:
+                if keyword in interest_df.columns:
+                    results[keyword] = (
+                        points[["date", keyword]]
+                        .rename(columns={keyword: "value"})
+                        .to_dict("records")
+                    )
+                else:
+                    results[keyword] = []
+            break
+
+        except Exception as e:
+            error_str = str(e).lower()
+            is_rate_limit = (
+                "429" in error_str
+                or "too many" in error_str
+                or "response" in error_str
+                or "quota" in error_str
+            )
+            if is_rate_limit:
+                record_proxy_result(proxy, rate_limited=True)
+            attempt += 1
+            if is_rate_limit and attempt < max_attempts:
+                # Exponential backoff with jitter
+                wait = base_delay * (2 ** attempt) + random.uniform(0.5, 2.0)
+                print(
+                    f"[TrendsRefresher] Rate limited on batch {batch}, "
+                    f"retrying in {wait:.1f}s (attempt {attempt}/{max_attempts})"
+                )
+                time.sleep(wait)
+            else:
+                raise
+
+    return results
+
+
+def fetch_trends_for_designers(designers):
+    """
+    Query Google Trends for each designer (in batches of 5).
+    Timeframe: last 5 years, worldwide.
+    Batches run on TRENDS_WORKERS threads so one batch's backoff sleep doesn't
+    hold up the others; trends_bucket keeps the overall request rate polite.
+    Returns ({ "chanel": [{"date": "2021-02", "value": 72}, ...], ... }, failed designers).
+    """
+    batches = [designers[i : i + 5] for i in range(0, len(designers), 5)]
+
+    results = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=TRENDS_WORKERS) as pool:
+        futures = {pool.submit(fetch_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                results.update(future.result())
+            except Exception as e:
+                print(f"[TrendsRefresher] Error for batch {futures[future]}: {e}")
+                failed.extend(futures[future])
+    return results, failed
+
+
+def get_previous_trends():
+    """Designer series from the payload currently in the cache, or {} if there is none."""
+    try:
+        obj = s3.get_object(Bucket=CACHE_BUCKET, Key=CACHE_KEY)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return {}
+        raise
+    raw = obj["Body"].read()
+    if obj.get("ContentEncoding") == "gzip":
+        raw = gzip.decompress(raw)
+    return (orjson.loads(raw) if orjson else json.loads(raw)).get("designers", {})
+
+
+def save_to_s3(data):
+    # The payload is very repetitive JSON, so gzip shrinks it roughly 10x
+    raw = orjson.dumps(data, default=str) if orjson else json.dumps(data, default=str).encode("utf-8")
+    s3.put_object(
+        Bucket=CACHE_BUCKET,
+        Key=CACHE_KEY,
+        Body=gzip.compress(raw, compresslevel=6),
+        ContentType="application/json",
+        ContentEncoding="gzip",
+        CacheControl="max-age=3600",
+    )
+
+
+def rebuild_cache():
+    """
+    Fetch fresh trends for every runway designer and save them to S3.
+    Raises after saving if any batch failed (their designers keep the previous
+    series), and without saving if every batch failed.
+    """
+    designers = get_designers_from_s3()
+    print(f"[TrendsRefresher] Found {len(designers)} unique designers: {designers}")
+
+    if not designers:
+        return {
+            "updated_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+            "designers": {},
+        }
+
+    trends_data, failed = fetch_trends_for_designers(designers)
+    if failed and not trends_data:
+        raise RuntimeError(f"Every Google Trends batch failed; kept the previous cache ({len(failed)} designers)")
+
+    if failed:
+        previous = get_previous_trends()
+        for designer in failed:
+            trends_data[designer] = previous.get(designer, [])
+
+    payload = {
+        "updated_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+        "designers": trends_data,
+    }
+    save_to_s3(payload)
+    print(f"[TrendsRefresher] Saved {len(trends_data)} designers to S3")
+
+    if failed:
+        raise RuntimeError(f"Google Trends failed for {len(failed)} designers (previous series kept): {failed}")
+    return payload
+
+
+def lambda_handler(event, context):
+    payload = rebuild_cache()
+    return {"updated_at": payload["updated_at"], "designers": len(payload["designers"])}
@@ -3,8 +3,8 @@
 Test script to analyze a single image with improved prompt
 """
 
+import os
 import json
-import base64
 import boto3
 from io import BytesIO
 from PIL import Image
@@ -12,35 +12,32 @@ from PIL import Image
 # Initialize Bedrock
 REGION = "eu-west-2"
 bedrock = boto3.client("bedrock-runtime", region_name=REGION)
+# "optimized" is opt-in: Claude 3 Haiku in eu-west-2 only offers "standard"
+LATENCY = os.environ.get("BEDROCK_LATENCY", "standard")
 
 def preprocess_image(image_path):
     """Load and preprocess image"""
     with Image.open(image_path) as img:
+        img.draft("RGB", (1024, 1024))  # decode large JPEGs at reduced DCT scale
         img = img.convert("RGB")
         img.thumbnail((1024, 1024))
         buf = BytesIO()
         img.save(buf, format="JPEG", quality=85)
-        return base64.b64encode(buf.getvalue()).decode("utf-8")
-
-def analyze_image(image_b64: str):
-    """Analyze image with improved prompt"""
-    payload = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 1500,
-        "messages": [
+        return buf.getvalue()
+
+def analyze_image(image_bytes: bytes):
+    """Analyze image with improved prompt (Converse API)"""
+    messages = [
             {
                 "role": "user",
                 "content": [
                     {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": image_b64
+                        "image": {
+                            "format": "jpeg",
+                            "source": {"bytes": image_bytes}
                         }
                     },
                     {
-                        "type": "text",
                         "text": """You are a highly precise fashion image parsing system with exceptional attention to detail.
 
 TASK:
@@ -113,18 +110,16 @@ IMPORTANT:
                     }
                 ]
             }
-        ]
-    }
+    ]
     
-    response = bedrock.invoke_model(
+    response = bedrock.converse(
         modelId="anthropic.claude-3-haiku-20240307-v1:0",
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps(payload)
+        messages=messages,
+        inferenceConfig={"maxTokens": 1500, "temperature": 0},
+        performanceConfig={"latency": LATENCY}
     )
     
-    response_body = json.loads(response["body"].read())
-    response_text = response_body["content"][0]["text"]
+    response_text = response["output"]["message"]["content"][0]["text"]
     
     # Clean potential markdown code blocks
     response_text = response_text.replace("```json", "").replace("```", "").strip()
@@ -135,10 +130,10 @@ print("🔍 Testing improved prompt on image...")
 print("=" * 60)
 
 image_path = "/Users/moni_aswani/Downloads/fi/FashionTrendyfor.fi/new_tests/31/01/output_segmented/Lacoste-Ready-To-Wear-Spring-Summer-2026-Paris-Fashion-Week-Runway-012_segmented.png"
-image_b64 = preprocess_image(image_path)
+image_bytes = preprocess_image(image_path)
 
 print("📸 Analyzing image with Claude via Bedrock...")
-result = analyze_image(image_b64)
+result = analyze_image(image_bytes)
 
 print("\n✅ RESULTS:")
 print(json.dumps(result, indent=2))
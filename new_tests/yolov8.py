@@ -1,8 +1,19 @@
 import boto3
+import numpy as np
+import torch
+from botocore.config import Config
 from ultralytics import YOLO
 from PIL import Image
 from io import BytesIO
 import os
+import queue
+import threading
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB  # libjpeg-turbo SIMD encoder
+    jpeg = TurboJPEG()
+except (ImportError, RuntimeError):
+    jpeg = None
 
 # =====================
 # CONFIG
@@ -13,6 +24,20 @@ OUTPUT_PREFIX = "balenciaga-ready-to-wear-spring-summer-2026-paris/cropped/"
 
 CONF_THRESHOLD = 0.4
 
+# Images per YOLO forward pass, and parallel S3 transfers around it
+BATCH_SIZE = 16
+DOWNLOAD_WORKERS = 8
+UPLOAD_WORKERS = 8
+QUEUE_SIZE = 32
+IMGSZ = 640
+
+# PyTorch weights, and the ONNX export cached next to them for onnxruntime inference
+MODEL_PT = "yolov8s.pt"
+MODEL_ONNX = "yolov8s.onnx"
+# INT8 (QDQ) model for CPU inference, calibrated on a sample of this show's images
+MODEL_INT8 = "yolov8s.int8.onnx"
+CALIBRATION_IMAGES = 50
+
 # Vertical splits (tuned for runway poses)
 TOP_RATIO = 0.40
 BOTTOM_RATIO = 0.75
@@ -20,8 +45,13 @@ BOTTOM_RATIO = 0.75
 # =====================
 # INIT
 # =====================
-s3 = boto3.client("s3")
-model = YOLO("yolov8s.pt")
+# Pool sized for the downloader + uploader threads sharing this client
+s3 = boto3.client("s3", config=Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+    tcp_keepalive=True,
+))
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
 # =====================
 # HELPERS
@@ -43,10 +73,18 @@ def load_image(bucket, key):
     return Image.open(BytesIO(obj["Body"].read())).convert("RGB")
 
 
-def upload_crop(bucket, key, image):
+def encode_jpeg(arr):
+    """Encode an RGB array (possibly a strided view) to JPEG bytes"""
+    if jpeg:
+        # The encoder needs packed rows; this is the only copy of the crop's pixels
+        return jpeg.encode(np.ascontiguousarray(arr), quality=90, pixel_format=TJPF_RGB)
     buf = BytesIO()
-    image.save(buf, format="JPEG", quality=90)
-    buf.seek(0)
+    Image.fromarray(arr).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def upload_crop(bucket, key, crop):
+    buf = encode_jpeg(crop)
 
     s3.put_object(
         Bucket=bucket,
@@ -56,7 +94,8 @@ def upload_crop(bucket, key, image):
     )
 
 
-def split_person(image, bbox):
+def split_person(arr, bbox):
+    """Slice top / bottom / shoes regions out of an HxWx3 array as views (no pixel copies)"""
     x1, y1, x2, y2 = bbox
     height = y2 - y1
 
@@ -82,51 +121,172 @@ def split_person(image, bbox):
     )
 
     return {
-        "top": image.crop(top_box),
-        "bottom": image.crop(bottom_box),
-        "shoes": image.crop(shoes_box),
+        label: arr[top:bottom, left:right]
+        for label, (left, top, right, bottom) in (
+            ("top", top_box),
+            ("bottom", bottom_box),
+            ("shoes", shoes_box),
+        )
     }
 
 
+# =====================
+# MODEL
+# =====================
+def letterbox(image):
+    """Resize into an IMGSZ square with grey padding, as NCHW float32 in [0, 1] (YOLO's input)"""
+    scale = IMGSZ / max(image.size)
+    resized = image.resize((round(image.width * scale), round(image.height * scale)), Image.BILINEAR)
+    canvas = Image.new("RGB", (IMGSZ, IMGSZ), (114, 114, 114))
+    canvas.paste(resized, ((IMGSZ - resized.width) // 2, (IMGSZ - resized.height) // 2))
+    return (np.asarray(canvas, dtype=np.float32) / 255.0).transpose(2, 0, 1)[None]
+
+
+def quantize_int8(src, dst):
+    """Statically quantize the ONNX model to INT8 using runway images for calibration"""
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = onnx.load(src).graph.input[0].name
+    keys = list_images(BUCKET, SOURCE_PREFIX)[:CALIBRATION_IMAGES]
+
+    class RunwayCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._keys = iter(keys)
+
+        def get_next(self):
+            key = next(self._keys, None)
+            return None if key is None else {input_name: letterbox(load_image(BUCKET, key))}
+
+    print(f"🧮 Quantizing {src} to INT8 on {len(keys)} calibration images...")
+    quantize_static(
+        src, dst, RunwayCalibrationReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+
+    # Carry over the export metadata (class names, stride, imgsz) Ultralytics reads back
+    fp32, int8 = onnx.load(src), onnx.load(dst)
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, dst)
+
+
+def load_model():
+    """
+    Run YOLO through onnxruntime when it is installed (exporting the ONNX
+    graph once, and quantizing it to INT8 for CPU), else fall back to the PyTorch weights.
+    Ultralytics wraps both backends in the same Results/boxes interface.
+    """
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return YOLO(MODEL_PT).to(DEVICE), DEVICE == "cuda"
+
+    if not os.path.exists(MODEL_ONNX):
+        # Dynamic axes so the final, partial batch runs through the same graph
+        YOLO(MODEL_PT).export(format="onnx", imgsz=IMGSZ, dynamic=True, simplify=True, opset=17)
+    if DEVICE == "cpu":
+        if not os.path.exists(MODEL_INT8):
+            quantize_int8(MODEL_ONNX, MODEL_INT8)
+        return YOLO(MODEL_INT8, task="detect"), False
+    # The exported graph is FP32, so no half-precision inputs
+    return YOLO(MODEL_ONNX, task="detect"), False
+
+
+# FP16 only for the PyTorch model on GPU
+model, HALF = load_model()
+PERSON_CLASS = next(i for i, name in model.names.items() if name == "person")
+
+
 # =====================
 # PIPELINE
 # =====================
-def process_image(s3_key):
+def largest_person(xyxy, cls, conf, threshold):
+    """Index of the largest confident person box, or -1 if there is none"""
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    areas[(cls != PERSON_CLASS) | (conf <= threshold)] = -1
+    if not len(areas) or areas.max() < 0:
+        return -1
+    return int(areas.argmax())
+
+
+def process_result(s3_key, image, results):
+    """Return {crop_key: crop} for the largest detected person, or {} if none"""
     print(f"\n🔍 Processing: {s3_key}")
-    image = load_image(BUCKET, s3_key)
     image_name = os.path.basename(s3_key).rsplit(".", 1)[0]
 
-    results = model(image)[0]
-
-    # Find the highest-confidence person
-    person_boxes = [
-        box for box in results.boxes
-        if model.names[int(box.cls)] == "person"
-        and float(box.conf) > CONF_THRESHOLD
-    ]
+    # Move the detections off the device once, then pick the box in numpy
+    boxes = results.boxes
+    xyxy = boxes.xyxy.cpu().numpy()
+    best = largest_person(xyxy, boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy(), CONF_THRESHOLD)
 
-    if not person_boxes:
+    if best < 0:
         print("⚠️ No person detected")
-        return
+        return {}
 
     # Use largest person box (runway model assumption)
-    person_box = max(
-        person_boxes,
-        key=lambda b: (b.xyxy[0][2] - b.xyxy[0][0]) *
-                      (b.xyxy[0][3] - b.xyxy[0][1])
-    )
+    x1, y1, x2, y2 = map(int, xyxy[best])
+    # One array view of the decoded image; crops are slices of it until JPEG encoding
+    crops = split_person(np.asarray(image), (x1, y1, x2, y2))
 
-    x1, y1, x2, y2 = map(int, person_box.xyxy[0])
-    crops = split_person(image, (x1, y1, x2, y2))
+    return {
+        f"{OUTPUT_PREFIX}{image_name}_{label}.jpg": crop
+        for label, crop in crops.items()
+    }
 
-    for label, crop in crops.items():
-        crop_key = (
-            f"{OUTPUT_PREFIX}"
-            f"{image_name}_{label}.jpg"
-        )
 
-        upload_crop(BUCKET, crop_key, crop)
-        print(f"⬆️ Uploaded: {crop_key}")
+def downloader(keys, loaded):
+    """Stage 1: S3 GET -> (key, image) on the loaded queue; None marks this worker done"""
+    while True:
+        try:
+            key = keys.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            loaded.put((key, load_image(BUCKET, key)))
+        except Exception as e:
+            print(f"⚠️ Download failed for {key}: {e}")
+    loaded.put(None)
+
+
+def inference(loaded, uploads):
+    """Stage 2: batch loaded images through YOLO and queue the crops for upload"""
+    remaining = DOWNLOAD_WORKERS
+    while remaining:
+        batch = []
+        while remaining and len(batch) < BATCH_SIZE:
+            item = loaded.get()
+            if item is None:
+                remaining -= 1
+            else:
+                batch.append(item)
+        if not batch:
+            continue
+
+        # One batched forward pass per BATCH_SIZE images
+        try:
+            results = model([image for _, image in batch], imgsz=IMGSZ, device=DEVICE, half=HALF, verbose=False)
+        except Exception as e:
+            print(f"⚠️ Inference failed for batch starting {batch[0][0]}: {e}")
+            continue
+        for (key, image), result in zip(batch, results):
+            for crop_key, crop in process_result(key, image, result).items():
+                uploads.put((crop_key, crop))
+    for _ in range(UPLOAD_WORKERS):
+        uploads.put(None)
+
+
+def uploader(uploads):
+    """Stage 3: S3 PUT each crop until the inference stage signals the end"""
+    while (item := uploads.get()) is not None:
+        crop_key, crop = item
+        try:
+            upload_crop(BUCKET, crop_key, crop)
+            print(f"⬆️ Uploaded: {crop_key}")
+        except Exception as e:
+            print(f"⚠️ Upload failed for {crop_key}: {e}")
 
 # =====================
 # MAIN
@@ -135,8 +295,22 @@ def main():
     images = list_images(BUCKET, SOURCE_PREFIX)
     print(f"📸 Found {len(images)} images")
 
+    keys = queue.Queue()
     for key in images:
-        process_image(key)
+        keys.put(key)
+    # Bounded queues keep downloads and uploads only a few batches ahead of the model
+    loaded = queue.Queue(maxsize=QUEUE_SIZE)
+    uploads = queue.Queue(maxsize=QUEUE_SIZE)
+
+    threads = (
+        [threading.Thread(target=downloader, args=(keys, loaded)) for _ in range(DOWNLOAD_WORKERS)]
+        + [threading.Thread(target=inference, args=(loaded, uploads))]
+        + [threading.Thread(target=uploader, args=(uploads,)) for _ in range(UPLOAD_WORKERS)]
+    )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
     print("\n✅ Done: top / bottom / shoes baseline")
 
@@ -1,10 +1,21 @@
 """
 ITEM NORMALIZATION AND VALIDATION
 Enforces single-word item names, removes hairstyles, and cleans data
+
+Type-clean for mypyc; `mypyc reinforcement_agents_normalized.py` builds an
+extension module that imports in place of this file.
 """
 
+import re
 import json
-from typing import Dict, List, Tuple
+import sys
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import ahocorasick  # type: ignore  # pyahocorasick: one DFA pass for all keywords
+except ImportError:
+    ahocorasick = None
 
 
 # ============== ITEM NORMALIZATION ==============
@@ -16,7 +27,9 @@ HAIRSTYLE_KEYWORDS = [
     "balayage", "highlights", "roots", "texture"
 ]
 
-VALID_ITEM_NAMES = {
+# Interned so every normalized item shares one object per name, and
+# downstream dict lookups hit the identity fast path
+VALID_ITEM_NAMES = frozenset(sys.intern(name) for name in {
     # Head
     "cap", "hat", "beanie", "headband", "crown", "tiara",
     
@@ -45,7 +58,7 @@ VALID_ITEM_NAMES = {
     
     # Eyewear
     "glasses", "sunglasses", "goggles",
-}
+})
 
 INVALID_ITEM_PATTERNS = [
     # Hairstyles
@@ -57,18 +70,44 @@ INVALID_ITEM_PATTERNS = [
 ]
 
 
+def _keyword_matcher(keywords: List[str]) -> Callable[[str], bool]:
+    """
+    Build a substring matcher for keywords, compiled once at import.
+    Aho-Corasick when pyahocorasick is installed, else a single alternation regex.
+    """
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+
+    pattern = re.compile("|".join(map(re.escape, keywords)))
+    return lambda text: pattern.search(text) is not None
+
+
+_HAIRSTYLE_MATCH = _keyword_matcher(HAIRSTYLE_KEYWORDS)
+_INVALID_MATCH = _keyword_matcher(INVALID_ITEM_PATTERNS)
+
+# Whole-item forms of the invalid patterns: hashed single words, plus the few phrases
+_INVALID = frozenset(p for p in INVALID_ITEM_PATTERNS if " " not in p)
+_INVALID_PHRASES = tuple(p for p in INVALID_ITEM_PATTERNS if " " in p)
+
+
 def is_hairstyle(item_name: str) -> bool:
     """Check if item is a hairstyle rather than clothing"""
-    item_lower = item_name.lower()
-    
-    for keyword in HAIRSTYLE_KEYWORDS:
-        if keyword in item_lower:
-            return True
-    
-    return False
+    return _HAIRSTYLE_MATCH(item_name.lower())
+
 
+def is_invalid_pattern(item_name: str) -> bool:
+    """Check if item contains a hairstyle, descriptor or vague-description pattern"""
+    return _INVALID_MATCH(item_name.lower())
 
-def normalize_item_name(item_name: str) -> str:
+
+# Model output repeats the same messy strings across a dataset; both
+# functions are pure and return immutable values, so results are memoised
+@lru_cache(maxsize=4096)
+def normalize_item_name(item_name: str) -> Optional[str]:
     """
     Convert multi-word items to single word
     
@@ -78,42 +117,73 @@ def normalize_item_name(item_name: str) -> str:
     "sleek ponytail hairstyle" → FILTERED OUT
     """
     
-    # Remove if hairstyle
-    if is_hairstyle(item_name):
-        return None
-    
     item_lower = item_name.lower().strip()
     
-    # Remove descriptors and get the core item
-    # Pattern: remove adjectives, keep the noun
-    
-    # Remove forward slash variants (clutch/purse → clutch)
-    if "/" in item_lower:
-        items = item_lower.split("/")
-        # Take the first one (usually most specific)
-        item_lower = items[0].strip()
-    
-    # Extract single word from multi-word description
-    words = item_lower.split()
+    # Already a clean single-word item (no valid name contains a hairstyle keyword)
+    if item_lower in VALID_ITEM_NAMES:
+        return sys.intern(item_lower)
     
-    # If already single word and valid, return
-    if len(words) == 1 and item_lower in VALID_ITEM_NAMES:
-        return item_lower
+    # Bare vague descriptions ("look", "outfit", "styled hair") carry no item
+    if item_lower in _INVALID or any(p in item_lower for p in _INVALID_PHRASES):
+        return None
     
-    # Try to find the noun (last word usually)
-    for word in reversed(words):
-        if word in VALID_ITEM_NAMES:
-            return word
+    # Remove if hairstyle
+    if _HAIRSTYLE_MATCH(item_lower):
+        return None
     
-    # Try to find any valid item word
-    for word in words:
+    # Remove forward slash variants, keeping the first (usually most specific): clutch/purse → clutch
+    # Then find the noun - usually the last word after the adjectives
+    for word in reversed(item_lower.partition("/")[0].split()):
         if word in VALID_ITEM_NAMES:
-            return word
+            return sys.intern(word)
     
     # If no valid item found, return None
     return None
 
 
+# Valid materials for each item type (lowercase; first entry is the fallback suggestion)
+MATERIAL_RULES: Dict[str, Tuple[str, ...]] = {
+    "cap": ("wool", "cotton", "felt", "silk", "synthetic", "polyester"),
+    "hat": ("wool", "cotton", "felt", "silk", "synthetic", "polyester"),
+    "headband": ("cotton", "elastic", "metal", "synthetic"),
+    "earrings": ("metal", "gold", "silver", "pearl", "glass", "plastic"),
+    "necklace": ("metal", "gold", "silver", "pearl", "leather"),
+    "bracelet": ("metal", "gold", "silver", "leather"),
+    "ring": ("metal", "gold", "silver", "platinum"),
+    "shirt": ("cotton", "silk", "linen", "polyester", "wool", "rayon"),
+    "top": ("cotton", "silk", "linen", "polyester", "wool", "rayon"),
+    "blouse": ("cotton", "silk", "linen", "polyester"),
+    "sweater": ("wool", "cotton", "synthetic", "cashmere"),
+    "cardigan": ("wool", "cotton", "synthetic", "cashmere"),
+    "jacket": ("wool", "cotton", "silk", "leather", "polyester", "linen", "denim"),
+    "blazer": ("wool", "cotton", "silk", "leather", "polyester"),
+    "coat": ("wool", "cotton", "silk", "leather", "polyester", "nylon"),
+    "pants": ("cotton", "wool", "linen", "polyester", "denim"),
+    "trousers": ("cotton", "wool", "linen", "polyester", "denim"),
+    "jeans": ("denim", "cotton"),
+    "skirt": ("cotton", "wool", "silk", "polyester", "linen"),
+    "dress": ("cotton", "wool", "silk", "polyester", "linen"),
+    "leggings": ("cotton", "polyester", "spandex", "nylon"),
+    "boots": ("leather", "suede", "rubber", "synthetic"),
+    "shoes": ("leather", "suede", "canvas", "rubber", "synthetic"),
+    "sandals": ("leather", "rubber", "eva foam", "synthetic"),
+    "heels": ("leather", "suede", "satin", "synthetic"),
+    "belt": ("leather", "metal", "canvas", "synthetic"),
+    "bag": ("leather", "canvas", "synthetic", "nylon", "suede"),
+    "purse": ("leather", "canvas", "synthetic", "suede"),
+    "clutch": ("leather", "canvas", "synthetic", "suede", "satin"),
+    "backpack": ("leather", "canvas", "nylon", "synthetic"),
+    "scarf": ("silk", "wool", "cotton", "linen", "synthetic"),
+    "gloves": ("leather", "wool", "cotton", "synthetic"),
+    "socks": ("cotton", "wool", "nylon", "polyester"),
+    "glasses": ("metal", "plastic", "acetate"),
+}
+
+# Frozen sets for the O(1) exact-match check before the substring fallback
+_MATERIAL_SETS: Dict[str, frozenset] = {item: frozenset(mats) for item, mats in MATERIAL_RULES.items()}
+
+
+@lru_cache(maxsize=2048)
 def validate_material(item: str, material: str) -> Tuple[bool, str]:
     """
     Validate material makes sense for item type
@@ -123,57 +193,22 @@ def validate_material(item: str, material: str) -> Tuple[bool, str]:
     
     material_lower = material.lower().strip()
     
-    # Define valid materials for each item type
-    material_rules = {
-        "cap": ["wool", "cotton", "felt", "silk", "synthetic", "polyester"],
-        "hat": ["wool", "cotton", "felt", "silk", "synthetic", "polyester"],
-        "headband": ["cotton", "elastic", "metal", "synthetic"],
-        "earrings": ["metal", "gold", "silver", "pearl", "glass", "plastic"],
-        "necklace": ["metal", "gold", "silver", "pearl", "leather"],
-        "bracelet": ["metal", "gold", "silver", "leather"],
-        "ring": ["metal", "gold", "silver", "platinum"],
-        "shirt": ["cotton", "silk", "linen", "polyester", "wool", "rayon"],
-        "top": ["cotton", "silk", "linen", "polyester", "wool", "rayon"],
-        "blouse": ["cotton", "silk", "linen", "polyester"],
-        "sweater": ["wool", "cotton", "synthetic", "cashmere"],
-        "cardigan": ["wool", "cotton", "synthetic", "cashmere"],
-        "jacket": ["wool", "cotton", "silk", "leather", "polyester", "linen", "denim"],
-        "blazer": ["wool", "cotton", "silk", "leather", "polyester"],
-        "coat": ["wool", "cotton", "silk", "leather", "polyester", "nylon"],
-        "pants": ["cotton", "wool", "linen", "polyester", "denim"],
-        "trousers": ["cotton", "wool", "linen", "polyester", "denim"],
-        "jeans": ["denim", "cotton"],
-        "skirt": ["cotton", "wool", "silk", "polyester", "linen"],
-        "dress": ["cotton", "wool", "silk", "polyester", "linen"],
-        "leggings": ["cotton", "polyester", "spandex", "nylon"],
-        "boots": ["leather", "suede", "rubber", "synthetic"],
-        "shoes": ["leather", "suede", "canvas", "rubber", "synthetic"],
-        "sandals": ["leather", "rubber", "EVA foam", "synthetic"],
-        "heels": ["leather", "suede", "satin", "synthetic"],
-        "belt": ["leather", "metal", "canvas", "synthetic"],
-        "bag": ["leather", "canvas", "synthetic", "nylon", "suede"],
-        "purse": ["leather", "canvas", "synthetic", "suede"],
-        "clutch": ["leather", "canvas", "synthetic", "suede", "satin"],
-        "backpack": ["leather", "canvas", "nylon", "synthetic"],
-        "scarf": ["silk", "wool", "cotton", "linen", "synthetic"],
-        "gloves": ["leather", "wool", "cotton", "synthetic"],
-        "socks": ["cotton", "wool", "nylon", "polyester"],
-        "glasses": ["metal", "plastic", "acetate"],
-    }
-    
-    valid_materials = material_rules.get(item, [])
+    valid_materials = MATERIAL_RULES.get(item)
     
     if not valid_materials:
         # Item not in rules, accept any reasonable material
         return True, material_lower
     
-    # Check if material matches any valid option
+    if material_lower in _MATERIAL_SETS[item]:
+        return True, sys.intern(material_lower)
+    
+    # Check if material partially matches any valid option
     for valid_mat in valid_materials:
-        if valid_mat.lower() in material_lower or material_lower in valid_mat.lower():
-            return True, valid_mat.lower()
+        if valid_mat in material_lower or material_lower in valid_mat:
+            return True, valid_mat
     
     # Not a valid material, suggest the first valid one
-    return False, valid_materials[0] if valid_materials else "unknown"
+    return False, valid_materials[0]
 
 
 def validate_and_normalize_extraction(analysis_json: Dict) -> Dict:
@@ -207,7 +242,9 @@ def validate_and_normalize_extraction(analysis_json: Dict) -> Dict:
             issues.append(f"❌ REMOVED: '{item}' - invalid item (hairstyle or non-clothing)")
             continue
         
-        if normalized in normalized_items:
+        # normalized_materials holds the same keys as normalized_items: an O(1) check.
+        # Duplicates stop here, so each normalized item is validated only once below
+        if normalized in normalized_materials:
             issues.append(f"⚠️  SKIPPED: '{item}' normalizes to '{normalized}' (duplicate)")
             continue
         
@@ -294,16 +331,14 @@ def validate_extraction_strict(analysis_json: Dict) -> Dict:
         hex_colors = normalized.get("item_colors_hex", {})
         color_names = normalized.get("item_colors_name", {})
         
-        for item in items:
-            if item not in materials:
-                issues.append(f"{item}: missing material")
-                score -= 5
-            if item not in hex_colors:
-                issues.append(f"{item}: missing hex color")
-                score -= 5
-            if item not in color_names:
-                issues.append(f"{item}: missing color name")
-                score -= 5
+        # Set differences instead of three dict lookups per item; normally all empty
+        items_set = set(items)
+        if not items_set <= materials.keys() & hex_colors.keys() & color_names.keys():
+            for item in items:
+                for mapping, label in ((materials, "material"), (hex_colors, "hex color"), (color_names, "color name")):
+                    if item not in mapping:
+                        issues.append(f"{item}: missing {label}")
+                        score -= 5
         
         is_valid = len(issues) == 0 and len(items) >= 6
         
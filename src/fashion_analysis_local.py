@@ -1,20 +1,56 @@
 #!/usr/bin/env python3
 """
 Local Fashion Analysis Script - AWS Bedrock Version
-Optimized version that loads existing filenames into memory for fast checking
+Already-processed images are detected per file via the original_image_name GSI
 """
 
 import os
+import re
 import json
-import base64
 import csv
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+import queue
+import random
+import tempfile
 import boto3
 from pathlib import Path
 from datetime import datetime
 from io import BytesIO
+from contextlib import closing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from PIL import Image
-from boto3.dynamodb.conditions import Attr
-import boto3
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+try:
+    import orjson  # faster codec for the large base64-bearing Bedrock bodies
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson else json.loads
+
+
+def json_dumps(obj) -> str:
+    """Serialize to a JSON str with orjson when available"""
+    return orjson.dumps(obj).decode("utf-8") if orjson else json.dumps(obj)
+
+
+try:
+    import pybase64 as base64  # SIMD drop-in for the stdlib b64encode
+except ImportError:
+    import base64
+
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB  # libjpeg-turbo SIMD encoder
+    jpeg = TurboJPEG()
+except (ImportError, RuntimeError):
+    jpeg = None
 
 
 # ---------------- CONFIG ----------------
@@ -24,10 +60,111 @@ RUNWAY_DATE_ISO = datetime.strptime(
     RUNWAY_DATE, "%B %d, %Y %I:%M %p"
 ).isoformat()
 
+# Supported image formats
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# GSI keyed on original_image_name (the table's hash key is image_id),
+# created by the OriginalImageNameIndex cell in Untitled-1.ipynb
+FILENAME_INDEX = "OriginalImageNameIndex"
+
+# Local cache of filenames known to be in DynamoDB, per-show metadata and
+# analyses keyed by image content hash (delete the file to force a full recheck)
+SEEN_CACHE_PATH = Path(
+    os.environ.get("FASHION_CACHE_DIR", Path.home() / ".cache" / "fashion")
+) / "seen.sqlite"
+
+# Preprocessed JPEGs keyed by source content hash, reused across runs
+PREPROCESSED_DIR = SEEN_CACHE_PATH.parent / "preprocessed"
+
+# Number of concurrent filename GSI lookups (GSIs have no BatchGetItem)
+LOOKUP_WORKERS = 25
+
+# Number of images analyzed concurrently (tune to the account's Bedrock quota)
+BEDROCK_WORKERS = 8
+MAX_BEDROCK_WORKERS = 32  # stays well inside the shared client's connection pool
+BEDROCK_MAX_ATTEMPTS = 3
+# Analysis attempts when Claude's JSON fails validation (each retry sends the errors back)
+ANALYSIS_MAX_ATTEMPTS = 3
+SONNET_MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+# Filename parsing is simple enough for the cheaper, faster model
+HAIKU_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+# Vision analysis tries the faster Haiku first; answers failing validation retry on Sonnet
+# (Claude 3.5 Haiku takes no image input, so the vision tier stays on Claude 3 Haiku)
+ANALYSIS_MODEL_ID = HAIKU_MODEL_ID
+ANALYSIS_FALLBACK_MODEL_ID = SONNET_MODEL_ID
+# Anthropic prompt caching for the shared analysis instructions. Opt-in: Bedrock only
+# accepts cache checkpoints on newer models (e.g. Claude 3.5 Haiku / 3.7 Sonnet)
+PROMPT_CACHING = os.environ.get("BEDROCK_PROMPT_CACHE") == "1"
+CACHE_CONTROL = {"cache_control": {"type": "ephemeral"}} if PROMPT_CACHING else {}
+# Converse latency mode. Opt-in "optimized" is only offered for some models/regions
+# (not Claude 3 in eu-west-2); a model that rejects it drops back to "standard"
+BEDROCK_LATENCY = os.environ.get("BEDROCK_LATENCY", "standard")
+
+# Parallel DynamoDB writes (BatchWriteItem accepts at most 25 items per request)
+WRITE_WORKERS = 4
+BATCH_WRITE_SIZE = 25
+WRITE_MAX_ATTEMPTS = 8
+
+# Processes used for CPU-bound image preprocessing
+PREPROCESS_WORKERS = os.cpu_count() or 1
+
+# Images preprocessed ahead of the Bedrock workers in realtime mode (caps memory)
+PREFETCH_DEPTH = 4
+
+# Longest side / JPEG quality sent to Claude Vision (input tokens scale with pixel area)
+IMAGE_MAX_SIDE = 768
+IMAGE_QUALITY = 80
+
+# Shared client config: pool sized for the worker threads, keep-alive for
+# long runs, and adaptive retries that back off on server throttling signals
+BOTO_CONFIG = Config(
+    region_name=REGION,
+    max_pool_connections=64,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+    read_timeout=120,
+)
+
 # Initialize Bedrock client
-bedrock = boto3.client("bedrock-runtime", region_name=REGION)
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
+bedrock = boto3.client("bedrock-runtime", config=BOTO_CONFIG)
+dynamodb = boto3.resource("dynamodb", config=BOTO_CONFIG)
 table = dynamodb.Table("New_Fashion_Analysis")
+# Plain low-level client: takes and returns DynamoDB's typed wire format as-is
+# ({"S": ...}), unlike table.meta.client, which serializes plain values itself
+dynamodb_client = boto3.client("dynamodb", config=BOTO_CONFIG)
+
+# Bedrock batch inference (offline mode)
+BATCH_MIN_RECORDS = 100  # Bedrock rejects batch jobs smaller than this
+BATCH_POLL_SECONDS = 60
+
+# Runway filenames follow designer-collection-season-year-event-look.jpg
+METADATA_FILENAME_RE = re.compile(
+    r'^(?P<designer>.+?)-(?P<collection>ready-to-wear|haute-couture|menswear)-'
+    r'(?P<season>(?:spring-summer|fall-winter)-\d{4})-(?P<event>.+?)-\d+\.jpg$',
+    re.IGNORECASE,
+)
+# The event part is "<city>[-fashion-week][-runway]", or a generic "fashion-show-runway".
+# Only a known city names an event, so both paths write "<City> Fashion Week" or "unknown".
+FILENAME_EVENT_RE = re.compile(r'^(?P<city>.+?)(?:-fashion-week)?(?:-runway)?$')
+FASHION_WEEK_CITIES = frozenset({
+    "paris", "milan", "london", "new-york", "copenhagen", "tokyo", "berlin", "shanghai", "seoul",
+})
+
+HEX_COLOR_RE = re.compile(r"^#[0-9A-Fa-f]{6}$")
+
+# Fallback results when a Claude call fails
+UNKNOWN_METADATA = {
+    "designer": "unknown",
+    "collection": "unknown",
+    "season": "unknown",
+    "event": "unknown",
+}
+EMPTY_ANALYSIS = {
+    "clothing_items": [],
+    "material_decomposition": {},
+    "item_colors_hex": {},
+    "item_colors_name": {},
+}
 
 # ===== Statistics tracking =====
 stats = {
@@ -37,63 +174,203 @@ stats = {
     "total_items_inserted": 0,
 }
 
-# ===== Cache for existing filenames =====
-existing_filenames = set()
+# ===== Cache for per-show metadata (keyed on filename minus the look number) =====
+metadata_cache = {}
+_metadata_lock = threading.Lock()
+_show_locks = {}
+# Metadata lookups run here so they overlap the image analysis call
+_metadata_executor = ThreadPoolExecutor(max_workers=BEDROCK_WORKERS, thread_name_prefix="metadata")
 
 # ---------------- HELPERS ----------------
-def load_existing_filenames():
+class ParallelBatchWriter:
     """
-    Load all existing original_image_name values from DynamoDB into memory
-    This is much faster than scanning for each individual file
+    Drop-in replacement for table.batch_writer() that sends each 25-item
+    BatchWriteItem request from a thread pool, so write round-trips overlap
+    with each other and with ongoing Bedrock inference. put_item is safe to
+    call from several producer threads.
     """
-    global existing_filenames
-    
-    print("📥 Loading existing filenames from DynamoDB...")
-    existing_filenames = set()
-    
+
+    def __init__(self, table, partition_key="image_id", max_workers=WRITE_WORKERS):
+        # Low-level client is thread-safe; items are serialized by _send, so it
+        # must be the plain client (table.meta.client would serialize them again)
+        self._client = dynamodb_client
+        self._table_name = table.name
+        self._partition_key = partition_key
+        self._serializer = TypeSerializer()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = []
+        # Keyed on the partition key: BatchWriteItem rejects duplicate keys in one request
+        self._buffer = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def put_item(self, Item):
+        with self._lock:
+            self._buffer[Item[self._partition_key]] = Item
+            if len(self._buffer) >= BATCH_WRITE_SIZE:
+                self._flush()
+
+    def _flush(self):
+        # Caller holds the lock (or is the only thread left, on exit)
+        if not self._buffer:
+            return
+        items = list(self._buffer.values())
+        self._buffer = {}
+        self._futures.append(self._executor.submit(self._send, items))
+
+    def _send(self, items):
+        # Serialized on the worker so producers only pay for a dict insert
+        requests = [
+            {"PutRequest": {"Item": {k: self._serializer.serialize(v) for k, v in item.items()}}}
+            for item in items
+        ]
+        for attempt in range(WRITE_MAX_ATTEMPTS):
+            response = self._client.batch_write_item(RequestItems={self._table_name: requests})
+            requests = response.get("UnprocessedItems", {}).get(self._table_name)
+            if not requests:
+                return
+            # Throttled - back off with jitter before resending the leftovers
+            time.sleep(min(0.05 * 2 ** attempt, 5) + random.uniform(0, 0.05))
+        raise RuntimeError(f"{len(requests)} items still unprocessed after {WRITE_MAX_ATTEMPTS} attempts")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._flush()
+        self._executor.shutdown(wait=True)
+        # Surface any write failure
+        for future in self._futures:
+            future.result()
+        return False
+
+
+def _is_in_table(filename: str) -> bool:
+    """Query the filename GSI for a single original_image_name"""
+    # Low-level client is thread-safe (resources are not), so each worker uses it directly.
+    # It is the resource's client, so values are passed plain and serialized by boto3.
+    response = table.meta.client.query(
+        TableName=table.name,
+        IndexName=FILENAME_INDEX,
+        KeyConditionExpression='original_image_name = :name',
+        ExpressionAttributeValues={':name': filename},
+        Select='COUNT',
+        Limit=1,
+    )
+    return response['Count'] > 0
+
+
+def _open_seen_cache():
+    """Open (creating if needed) the local sqlite cache of processed filenames"""
+    SEEN_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(SEEN_CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS seen (original_image_name TEXT PRIMARY KEY)")
+    conn.execute("CREATE TABLE IF NOT EXISTS show_metadata (show TEXT PRIMARY KEY, metadata TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS image_analysis (image_hash TEXT PRIMARY KEY, analysis TEXT)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS preprocessed "
+        "(path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, source_hash TEXT)"
+    )
+    return conn
+
+
+def load_seen_cache() -> set:
+    """Return all filenames recorded as processed by previous runs"""
     try:
-        # Scan all items and collect unique original_image_name values
-        scan_kwargs = {
-            'ProjectionExpression': 'original_image_name'
-        }
-        
-        done = False
-        start_key = None
-        count = 0
-        
-        while not done:
-            if start_key:
-                scan_kwargs['ExclusiveStartKey'] = start_key
-            
-            response = table.scan(**scan_kwargs)
-            
-            # Add all filenames to set (automatically deduplicates)
-            for item in response.get('Items', []):
-                filename = item.get('original_image_name')
-                if filename:
-                    existing_filenames.add(filename)
-                    count += 1
-            
-            # Check if there are more items
-            start_key = response.get('LastEvaluatedKey')
-            done = not start_key
-        
-        print(f"✅ Loaded {len(existing_filenames)} unique filenames from DynamoDB\n")
-        
-    except Exception as e:
-        print(f"⚠️ Failed to load filenames: {e}")
-        print("   Continuing without caching (will be slower)\n")
+        with closing(_open_seen_cache()) as conn:
+            return {row[0] for row in conn.execute("SELECT original_image_name FROM seen")}
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not read local filename cache: {e}")
+        return set()
+
+
+def save_seen_cache(filenames):
+    """Record filenames known to be in DynamoDB for future runs"""
+    try:
+        with closing(_open_seen_cache()) as conn, conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen (original_image_name) VALUES (?)",
+                ((name,) for name in filenames),
+            )
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not update local filename cache: {e}")
+
+
+def encode_image(img) -> bytes:
+    """Resize an already-decoded PIL image for Claude API, returning JPEG bytes"""
+    img = img.convert("RGB")
+    img.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    if jpeg:
+        return jpeg.encode(np.asarray(img), quality=IMAGE_QUALITY, pixel_format=TJPF_RGB)
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=IMAGE_QUALITY)
+    return buf.getvalue()
+
+
+def preprocess_bytes(raw: bytes) -> bytes:
+    """Resize and re-encode raw image file bytes for Claude API, returning JPEG bytes"""
+    with Image.open(BytesIO(raw)) as img:
+        # Already a small RGB JPEG: send the file as-is, no decode/re-encode
+        if img.format == "JPEG" and img.mode == "RGB" and max(img.size) <= IMAGE_MAX_SIDE:
+            return raw
+
+        # Let libjpeg downscale during decode (DCT scaling) - no-op for other formats
+        img.draft("RGB", (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        return encode_image(img)
 
 
 def preprocess_image(image_path):
-    """Load and preprocess image for Claude API"""
+    """Load and preprocess image for Claude API, returning JPEG bytes"""
+    try:
+        with open(image_path, "rb") as f:
+            return preprocess_bytes(f.read())
+    except Exception as e:
+        print(f"⚠️ Image preprocessing failed for {image_path}: {e}")
+        return None
+
+
+def preprocess_image_cached(image_path):
+    """
+    preprocess_image backed by an on-disk cache keyed by the source file's content hash.
+    The file is only re-hashed when its mtime or size differ from the previous run.
+    """
     try:
-        with Image.open(image_path) as img:
-            img = img.convert("RGB")
-            img.thumbnail((1024, 1024))
-            buf = BytesIO()
-            img.save(buf, format="JPEG", quality=85)
-            return base64.b64encode(buf.getvalue()).decode("utf-8")
+        path = str(Path(image_path).resolve())
+        st = os.stat(path)
+        with closing(_open_seen_cache()) as conn:
+            row = conn.execute(
+                "SELECT source_hash FROM preprocessed WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (path, st.st_mtime_ns, st.st_size),
+            ).fetchone()
+        if row:
+            cached = PREPROCESSED_DIR / f"{row[0]}.jpg"
+            if cached.exists():
+                return cached.read_bytes()
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        # Output settings are part of the key so changing them invalidates old entries
+        hasher = hashlib.blake2b(f"{IMAGE_MAX_SIDE}:{IMAGE_QUALITY}:".encode(), digest_size=16)
+        hasher.update(raw)
+        source_hash = hasher.hexdigest()
+        cached = PREPROCESSED_DIR / f"{source_hash}.jpg"
+        if cached.exists():
+            image_bytes = cached.read_bytes()
+        else:
+            image_bytes = preprocess_bytes(raw)
+            PREPROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(image_bytes)
+            os.replace(tmp, cached)
+
+        with closing(_open_seen_cache()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO preprocessed (path, mtime_ns, size, source_hash) VALUES (?, ?, ?, ?)",
+                (path, st.st_mtime_ns, st.st_size, source_hash),
+            )
+        return image_bytes
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not update local preprocessing cache: {e}")
+        return preprocess_image(image_path)
     except Exception as e:
         print(f"⚠️ Image preprocessing failed for {image_path}: {e}")
         return None
@@ -106,37 +383,85 @@ def format_for_dynamodb(filename: str) -> str:
     Becomes: "Miu-Miu-Ready-To-Wear-Fall-Winter-2018-Fashion-Show-Runway-0003.jpg"
     """
     # Remove .jpg extension
-    name_without_ext = filename.rsplit('.', 1)[0] if '.' in filename else filename
-    
-    # Split by hyphen and capitalize each word
-    words = name_without_ext.split('-')
-    capitalized = [word.capitalize() for word in words]
-    
-    # Rejoin and add .jpg
-    return '-'.join(capitalized) + '.jpg'
+    base, _, _ = filename.rpartition('.')
 
+    # Capitalize each hyphen-separated word (str.title() would differ on
+    # segments like "0003a" or "dior's", breaking matches with existing rows)
+    return '-'.join(map(str.capitalize, (base or filename).split('-'))) + '.jpg'
 
-def extract_metadata(filename: str):
-    """Extract metadata from filename using Claude via Bedrock"""
-    payload = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 500,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": f"""
+
+def inference_config(payload: dict) -> dict:
+    """Converse inferenceConfig matching an invoke_model payload's sampling settings"""
+    return {
+        "maxTokens": payload["max_tokens"],
+        "temperature": payload["temperature"],
+        "topP": payload["top_p"],
+    }
+
+
+# Models that rejected BEDROCK_LATENCY this run; they are sent "standard" instead
+_standard_latency_models = set()
+_latency_lock = threading.Lock()
+
+
+def _latency_unsupported(error: ClientError) -> bool:
+    """True for the ValidationException Bedrock returns when a model lacks the requested latency mode"""
+    return (
+        error.response["Error"]["Code"] == "ValidationException"
+        and "latency" in error.response["Error"].get("Message", "").lower()
+    )
+
+
+def invoke_claude(messages: list, config: dict, model_id: str = SONNET_MODEL_ID) -> str:
+    """Invoke Claude via the Bedrock Converse API and return the response text, retrying throttled calls"""
+    attempt = 0
+    while True:
+        with _latency_lock:
+            latency = "standard" if model_id in _standard_latency_models else BEDROCK_LATENCY
+        try:
+            response = bedrock.converse(
+                modelId=model_id,
+                messages=messages,
+                inferenceConfig=config,
+                performanceConfig={"latency": latency},
+            )
+            return response["output"]["message"]["content"][0]["text"]
+        except ClientError as e:
+            if latency != "standard" and _latency_unsupported(e):
+                with _latency_lock:
+                    if model_id not in _standard_latency_models:
+                        print(f"⚠️ {latency} latency unavailable for {model_id}, using standard")
+                        _standard_latency_models.add(model_id)
+                continue
+            code = e.response["Error"]["Code"]
+            attempt += 1
+            if code != "ThrottlingException" or attempt == BEDROCK_MAX_ATTEMPTS:
+                raise
+            # Exponential backoff with jitter
+            time.sleep(2 ** (attempt - 1) + random.random())
+
+
+def get_db_original_name(image_file: Path) -> str:
+    """Map a local image file to its original_image_name in DynamoDB"""
+    original_filename = image_file.name
+
+    # Handle _segmented files - remove _segmented suffix
+    if '_segmented' in original_filename:
+        base_name = original_filename.rsplit('_segmented', 1)[0]
+        original_filename = f"{base_name}.jpg"
+
+    # Format filename to match DynamoDB format (Proper-Case-With-Dashes.jpg)
+    return format_for_dynamodb(original_filename)
+
+
+# Too short to reach Bedrock's minimum cacheable prefix, so it carries no cache mark
+METADATA_PROMPT = """
 You are a highly accurate fashion metadata extraction engine.
 
-Your ONLY input is the runway image filename below.
+Your ONLY input is the runway image filename given after these instructions.
 You must extract ALL possible metadata implied by the filename.
 Do NOT guess beyond filename evidence.
 
-Filename:
-{filename}
-
 Instructions:
 - Parse designer, collection type, season + year, and fashion event from the filename.
 - Use standard fashion naming conventions.
@@ -147,68 +472,161 @@ Instructions:
 
 Return ONLY valid JSON in exactly this schema:
 
-{{
+{
   "designer": "Full designer name or unknown",
   "collection": "Ready To Wear | Haute Couture | Menswear | unknown",
   "season": "Season Year or unknown",
   "event": "Fashion week event or unknown"
-}}
+}
 
 Do not include explanations, comments, or extra text.
 Only output valid JSON.
 """
-                    }
+
+
+def build_metadata_payload(filename: str) -> dict:
+    """Build the Claude payload for filename metadata extraction"""
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 300,  # the metadata JSON is a handful of short fields
+        "temperature": 0.0,
+        "top_p": 1.0,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": METADATA_PROMPT},
+                    {"type": "text", "text": f"Filename:\n{filename}"}
                 ]
             }
         ]
     }
-    
+
+
+def parse_json_object(text: str) -> dict:
+    """Parse the outermost {...} in text, ignoring markdown fences or stray prose around it"""
+    return json_loads(text[text.find("{"):text.rfind("}") + 1])
+
+
+def parse_metadata_response(response_text: str) -> dict:
+    """Parse Claude's metadata response text into a dict"""
+    return parse_json_object(response_text)
+
+
+def parse_filename_metadata(filename: str):
+    """Parse metadata straight from a well-formed runway filename, or None if it doesn't match"""
+    match = METADATA_FILENAME_RE.match(filename)
+    if not match:
+        return None
+    metadata = {
+        field: value.replace('-', ' ').title()
+        for field, value in match.groupdict().items()
+    }
+    city = FILENAME_EVENT_RE.match(match['event'].lower())['city']
+    metadata['event'] = (
+        f"{city.replace('-', ' ').title()} Fashion Week" if city in FASHION_WEEK_CITIES else "unknown"
+    )
+    return metadata
+
+
+def extract_metadata(filename: str):
+    """Extract metadata from filename, falling back to Claude via Bedrock for irregular names"""
+    metadata = parse_filename_metadata(filename)
+    if metadata:
+        return metadata
+
     try:
-        response = bedrock.invoke_model(
-            modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(payload)
+        return parse_metadata_response(
+            invoke_claude(metadata_messages(filename), METADATA_INFERENCE, HAIKU_MODEL_ID)
         )
-        
-        response_body = json.loads(response["body"].read())
-        response_text = response_body["content"][0]["text"]
-        
-        # Clean potential markdown code blocks
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
-        return json.loads(response_text)
     except Exception as e:
         print(f"⚠️ Metadata extraction failed: {e}")
-        return {
-            "designer": "unknown",
-            "collection": "unknown",
-            "season": "unknown",
-            "event": "unknown"
-        }
+        return dict(UNKNOWN_METADATA)
 
 
-def analyze_image(image_b64: str):
-    """Analyze image using Claude Vision via Bedrock - TWO STAGE APPROACH"""
-    
-    # STAGE 1: Describe what's in the image
-    stage1_payload = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 800,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": image_b64
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": """Carefully describe this runway fashion image. Be very specific about what you observe:
+def show_prefix(db_original_name: str) -> str:
+    """Show identifier shared by every look of a runway show (drops the trailing -NNNN.jpg)"""
+    return db_original_name.rsplit('-', 1)[0]
+
+
+def get_cached_show_metadata(show: str):
+    """Return metadata for a show from memory or the local sqlite cache, else None"""
+    if show in metadata_cache:
+        return metadata_cache[show]
+    try:
+        with closing(_open_seen_cache()) as conn:
+            row = conn.execute("SELECT metadata FROM show_metadata WHERE show = ?", (show,)).fetchone()
+    except sqlite3.Error:
+        return None
+    if row:
+        metadata_cache[show] = json_loads(row[0])
+        return metadata_cache[show]
+    return None
+
+
+def cache_show_metadata(show: str, metadata: dict):
+    """Remember a show's metadata for this run and, if it parsed, for future runs"""
+    metadata_cache[show] = metadata
+    if metadata == UNKNOWN_METADATA:
+        return
+    try:
+        with closing(_open_seen_cache()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO show_metadata (show, metadata) VALUES (?, ?)",
+                (show, json_dumps(metadata)),
+            )
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not update local metadata cache: {e}")
+
+
+def get_show_metadata(db_original_name: str) -> dict:
+    """Extract metadata once per show and reuse it for every look in that show"""
+    show = show_prefix(db_original_name)
+    with _metadata_lock:
+        show_lock = _show_locks.setdefault(show, threading.Lock())
+
+    # Per-show lock so concurrent workers on the same show make a single Bedrock call
+    with show_lock:
+        metadata = get_cached_show_metadata(show)
+        if metadata is None:
+            metadata = extract_metadata(db_original_name)
+            cache_show_metadata(show, metadata)
+        return metadata
+
+
+def image_hash(image_bytes: bytes) -> str:
+    """Content hash of a preprocessed image, used to spot duplicate images"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def get_cached_analysis(digest: str):
+    """Return a previous analysis of an identical image from the local cache, else None"""
+    try:
+        with closing(_open_seen_cache()) as conn:
+            row = conn.execute("SELECT analysis FROM image_analysis WHERE image_hash = ?", (digest,)).fetchone()
+    except sqlite3.Error:
+        return None
+    return json_loads(row[0]) if row else None
+
+
+def cache_analysis(digest: str, analysis: dict):
+    """Remember a successful analysis so identical images skip Bedrock"""
+    if analysis == EMPTY_ANALYSIS:
+        return
+    try:
+        with closing(_open_seen_cache()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO image_analysis (image_hash, analysis) VALUES (?, ?)",
+                (digest, json_dumps(analysis)),
+            )
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not update local analysis cache: {e}")
+
+
+ANALYSIS_PROMPT = """You are a complete fashion item detection system. Work in two steps.
+
+STEP 1 - DESCRIBE
+First, carefully describe this runway fashion image. Be very specific about what you observe:
 
 1. HEAD: What is on the model's head? (hat, cap, headband, etc.)
 2. FACE/EARS: Are there earrings or other jewelry visible on the face/ears?
@@ -223,57 +641,8 @@ def analyze_image(image_b64: str):
 
 Be as detailed and accurate as possible. This description will be used to ensure complete item detection.
 
-Return ONLY a text description, no JSON, no markdown."""
-                    }
-                ]
-            }
-        ]
-    }
-    
-    try:
-        # Get stage 1 response
-        response1 = bedrock.invoke_model(
-            modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(stage1_payload)
-        )
-        
-        response1_body = json.loads(response1["body"].read())
-        outfit_description = response1_body["content"][0]["text"]
-        
-        print(f"   📝 Outfit description:\n{outfit_description}\n")
-        
-    except Exception as e:
-        print(f"⚠️ Stage 1 (description) failed: {e}")
-        outfit_description = ""
-    
-    # STAGE 2: Extract items based on the description
-    stage2_payload = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 1500,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": image_b64
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": f"""You are a complete fashion item detection system. Based on the outfit description below, extract EVERY item visible.
-
-OUTFIT DESCRIPTION (from detailed analysis):
-{outfit_description}
-
----
-
-YOUR TASK: Extract all items mentioned or implied in the description above. Do not miss anything.
+STEP 2 - EXTRACT
+Then extract all items mentioned or implied in your description. Do not miss anything.
 
 CRITICAL RULES - AVOID DUPLICATES:
 1. Every item mentioned in the description MUST be in your output
@@ -352,88 +721,472 @@ Before outputting JSON, verify:
 ☐ Total item count: 6-10 items (runway outfit standard)
 ☐ Every item appears in all 3 mappings (materials, hex colors, color names)
 
-RETURN ONLY VALID JSON:
-{{
+STEP 2 JSON SCHEMA:
+{
   "clothing_items": ["item1", "item2", "item3"],
-  "material_decomposition": {{
+  "material_decomposition": {
     "item1": "material",
     "item2": "material"
-  }},
-  "item_colors_hex": {{
+  },
+  "item_colors_hex": {
     "item1": "#RRGGBB",
     "item2": "#RRGGBB"
-  }},
-  "item_colors_name": {{
+  },
+  "item_colors_name": {
     "item1": "color",
     "item2": "color"
-  }}
-}}
+  }
+}
+
+OUTPUT FORMAT:
+DESCRIPTION:
+<plain text description from step 1>
+JSON:
+<the JSON object from step 2>
+
+NO MARKDOWN, NO COMMENTARY AFTER THE JSON."""
 
-NO MARKDOWN, NO COMMENTARY, ONLY JSON."""
+
+def build_analysis_payload(image_b64: str) -> dict:
+    """
+    Build the Claude Vision payload for image analysis.
+    Describe-then-extract in a single call: the assistant turn is prefilled
+    with "DESCRIPTION:" so Claude writes the outfit description first and
+    then the JSON extraction, saving a full round-trip per image.
+    """
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 2300,  # description + JSON; the description alone runs well past 800
+        "temperature": 0.0,
+        "top_p": 1.0,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    # Instructions lead so they form a stable, cacheable prefix
+                    {"type": "text", "text": ANALYSIS_PROMPT, **CACHE_CONTROL},
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": "image/jpeg",
+                            "data": image_b64
+                        }
                     }
                 ]
+            },
+            {
+                "role": "assistant",
+                "content": [{"type": "text", "text": "DESCRIPTION:"}]
             }
         ]
     }
+
+
+# Batch-manifest request bodies serialized once at import; per call only the filename
+# or image data is spliced in, so the large base64 string skips the JSON encoder
+_METADATA_BODY_TEMPLATE = json.dumps(build_metadata_payload("__FILENAME__"))
+_ANALYSIS_BODY_TEMPLATE = json.dumps(build_analysis_payload("__IMAGE_DATA__"))
+
+
+def metadata_body(filename: str) -> str:
+    """Serialized metadata request body for a filename"""
+    return _METADATA_BODY_TEMPLATE.replace("__FILENAME__", json.dumps(filename)[1:-1])
+
+
+def analysis_body(image_bytes: bytes) -> str:
+    """Serialized analysis request body (base64 only at the last moment so workers pass raw bytes around)"""
+    return _ANALYSIS_BODY_TEMPLATE.replace(
+        "__IMAGE_DATA__", base64.b64encode(image_bytes).decode("ascii"), 1
+    )
+
+
+# Realtime (Converse) requests share the payloads' sampling settings, and take the
+# image as raw bytes - no JSON body or base64 on that path
+METADATA_INFERENCE = inference_config(build_metadata_payload(""))
+ANALYSIS_INFERENCE = inference_config(build_analysis_payload(""))
+_CACHE_POINT = [{"cachePoint": {"type": "default"}}] if PROMPT_CACHING else []
+
+
+def metadata_messages(filename: str) -> list:
+    """Converse messages for filename metadata extraction"""
+    return [{"role": "user", "content": [{"text": METADATA_PROMPT}, {"text": f"Filename:\n{filename}"}]}]
+
+
+def analysis_messages(image_bytes: bytes) -> list:
+    """Converse messages for image analysis, mirroring build_analysis_payload"""
+    return [
+        {"role": "user", "content": [
+            {"text": ANALYSIS_PROMPT},
+            *_CACHE_POINT,
+            {"image": {"format": "jpeg", "source": {"bytes": image_bytes}}},
+        ]},
+        {"role": "assistant", "content": [{"text": "DESCRIPTION:"}]},
+    ]
+
+
+def batch_record(record_id: str, body: str) -> str:
+    """One line of a Bedrock batch inference manifest"""
+    return f'{{"recordId": {json.dumps(record_id)}, "modelInput": {body}}}'
+
+
+def parse_analysis_response(response_text: str) -> dict:
+    """Split Claude's DESCRIPTION/JSON response and parse the JSON part"""
+    outfit_description, _, response_text = response_text.partition("JSON:")
+    
+    print(f"   📝 Outfit description:\n{outfit_description.strip()}\n")
     
+    return parse_json_object(response_text)
+
+
+def validate_analysis(analysis) -> list:
+    """Return the schema problems in a parsed analysis (empty when it is safe to write)"""
+    if not isinstance(analysis, dict):
+        return ["response must be a JSON object"]
+    items = analysis.get("clothing_items")
+    if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+        return ["clothing_items must be a list of strings"]
+
+    issues = []
+    for field in ("material_decomposition", "item_colors_hex", "item_colors_name"):
+        mapping = analysis.get(field)
+        if not isinstance(mapping, dict):
+            issues.append(f"{field} must be an object")
+            continue
+        missing = [item for item in items if item not in mapping]
+        if missing:
+            issues.append(f"{field} is missing {', '.join(missing)}")
+
+    hex_colors = analysis.get("item_colors_hex")
+    if isinstance(hex_colors, dict):
+        bad = [item for item, value in hex_colors.items() if not HEX_COLOR_RE.match(str(value))]
+        if bad:
+            issues.append(f"item_colors_hex must be #RRGGBB for {', '.join(bad)}")
+    return issues
+
+
+def build_retry_messages(messages: list, response_text: str, issues: list) -> list:
+    """Append Claude's invalid answer and the validation errors, then prefill a fresh attempt"""
+    messages[-1] = {"role": "assistant", "content": [{"text": "DESCRIPTION:" + response_text}]}
+    messages.append({"role": "user", "content": [{"text": (
+        f"Your output had errors: {'; '.join(issues)}. "
+        "Fix them and answer again in the same DESCRIPTION / JSON format."
+    )}]})
+    messages.append({"role": "assistant", "content": [{"text": "DESCRIPTION:"}]})
+    return messages
+
+
+def analyze_image(image_bytes: bytes):
+    """
+    Analyze image using Claude Vision via Bedrock, feeding validation errors back on retry.
+    The first attempt uses ANALYSIS_MODEL_ID; retries escalate to ANALYSIS_FALLBACK_MODEL_ID.
+    """
+    messages = analysis_messages(image_bytes)
     try:
-        # Get stage 2 response
-        response2 = bedrock.invoke_model(
-            modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(stage2_payload)
-        )
-        
-        response2_body = json.loads(response2["body"].read())
-        response_text = response2_body["content"][0]["text"]
-        
-        # Clean potential markdown code blocks
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
-        return json.loads(response_text)
-        
+        for attempt in range(ANALYSIS_MAX_ATTEMPTS):
+            model_id = ANALYSIS_MODEL_ID if attempt == 0 else ANALYSIS_FALLBACK_MODEL_ID
+            response_text = invoke_claude(messages, ANALYSIS_INFERENCE, model_id)
+            try:
+                analysis = parse_analysis_response(response_text)
+                issues = validate_analysis(analysis)
+            except ValueError as e:
+                issues = [f"invalid JSON ({e})"]
+            if not issues:
+                return analysis
+
+            print(f"⚠️ Invalid analysis (attempt {attempt + 1}/{ANALYSIS_MAX_ATTEMPTS}): {'; '.join(issues)}")
+            if attempt < ANALYSIS_MAX_ATTEMPTS - 1:
+                time.sleep(1.0 * (attempt + 1))
+                messages = build_retry_messages(messages, response_text, issues)
     except Exception as e:
-        print(f"⚠️ Stage 2 (extraction) failed: {e}")
-        return {
-            "clothing_items": [],
-            "material_decomposition": {},
-            "item_colors_hex": {},
-            "item_colors_name": {}
-        }
+        print(f"⚠️ Image analysis failed: {e}")
+    # Nothing is written for an image whose analysis never validated
+    return dict(EMPTY_ANALYSIS)
 
 
-def check_if_processed(filename: str) -> bool:
-    """Check if filename exists in cached set"""
-    is_processed = filename in existing_filenames
-    status = "✅ EXISTS in DynamoDB" if is_processed else "❌ NOT in DynamoDB (new)"
-    print(f"   📝 Original name: {filename} | {status}")
-    return is_processed
+def check_if_processed(filename: str, seen: set = frozenset()) -> bool:
+    """Check the local cache, then query the filename GSI - no table preload needed"""
+    if filename in seen:
+        return True
+    try:
+        return _is_in_table(filename)
+    except ClientError as e:
+        # Treating a failed lookup as "not processed" would re-analyze (and re-bill) the image
+        raise RuntimeError(
+            f"Could not check {filename} against {FILENAME_INDEX} "
+            f"(create the index with the Untitled-1.ipynb cell if it is missing): {e}"
+        ) from e
 
 
 # ---------------- MAIN PIPELINE ----------------
 
-def process_images(input_folder: str):
+def iter_images(root):
+    """
+    Recursively yield image paths under root.
+    os.scandir entries carry file type from readdir, so names are filtered
+    without a stat() per file or a Path object for every entry.
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_images(entry.path)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                yield entry.path
+
+
+def build_rows(db_original_name: str, metadata: dict, analysis: dict) -> list:
+    """Build the DynamoDB rows (one per clothing item) for an analyzed image"""
+    # Fields shared by every item of the image are built once
+    shared = {
+        'original_image_name': db_original_name,
+        'timestamp': datetime.utcnow().isoformat(),
+        'designer': metadata.get("designer", "unknown"),
+        'collection': metadata.get("collection", "unknown"),
+        'season': metadata.get("season", "unknown"),
+        'event': metadata.get("event", "unknown"),
+        'runway_date': RUNWAY_DATE_ISO,
+    }
+    # Lowercase GSI keys, derived as in the Untitled-1.ipynb backfills, so new rows
+    # land in DesignerSeasonIndex without another backfill
+    shared['designer_lower'] = shared['designer'].lower()
+    shared['season_lower'] = shared['season'].lower().replace(" ", "-")
+    materials = analysis["material_decomposition"]
+    colors_hex = analysis["item_colors_hex"]
+    colors_name = analysis["item_colors_name"]
+    return [
+        {
+            'image_id': f"{db_original_name}_{item}".lower(),
+            'item_name': item,
+            'materials': materials.get(item, "unknown"),
+            'color_hex': colors_hex.get(item, "unknown"),
+            'color_name': colors_name.get(item, "unknown"),
+            **shared,
+        }
+        for item in analysis.get("clothing_items", [])
+    ]
+
+
+def process_one_image(image_file: Path, db_original_name: str, image_bytes: bytes) -> list:
+    """
+    Run metadata extraction and image analysis for a single preprocessed image.
+    Returns the DynamoDB rows to insert (one per clothing item).
+    """
+    print(f"🔍 Processing: {image_file.name}")
+
+    if not image_bytes:
+        print(f"   ❌ Failed to preprocess image: {image_file.name}")
+        return []
+
+    # Extract metadata (once per show) while the image is being analyzed
+    metadata_future = _metadata_executor.submit(get_show_metadata, db_original_name)
+
+    # Analyze image, reusing the result for duplicates of an already-analyzed image
+    digest = image_hash(image_bytes)
+    analysis = get_cached_analysis(digest)
+    if analysis is not None:
+        print(f"   ♻️  Duplicate image, reusing cached analysis: {image_file.name}")
+    else:
+        analysis = analyze_image(image_bytes)
+        cache_analysis(digest, analysis)
+    return build_rows(db_original_name, metadata_future.result(), analysis)
+
+
+def analyze_realtime(pending: list, workers: int = BEDROCK_WORKERS, preprocess=preprocess_image_cached):
+    """
+    Analyze images with concurrent on-demand Bedrock calls, yielding (image_file, rows).
+    preprocess maps an image path to the JPEG bytes sent to Claude.
+    """
+    print(f"\n🚀 Analyzing {len(pending)} new images ({workers} concurrent)\n")
+
+    # Producer thread preprocesses the next images while the workers wait on Bedrock
+    prefetched = queue.Queue(maxsize=PREFETCH_DEPTH)
+
+    def prefetch():
+        for image_file, db_original_name in pending:
+            prefetched.put((image_file, db_original_name, preprocess(image_file)))
+
+    threading.Thread(target=prefetch, daemon=True).start()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        remaining = len(pending)
+        while remaining or in_flight:
+            # Keep every worker busy without pulling the whole backlog into memory
+            while remaining and len(in_flight) < workers:
+                image_file, db_original_name, image_bytes = prefetched.get()
+                remaining -= 1
+                in_flight[executor.submit(process_one_image, image_file, db_original_name, image_bytes)] = image_file
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                image_file = in_flight.pop(future)
+                try:
+                    yield image_file, future.result()
+                except Exception as e:
+                    print(f"   ❌ Error processing {image_file.name}: {e}")
+
+
+def run_batch_job(manifest_path: str, bucket: str, role_arn: str):
+    """
+    Run a Bedrock batch inference job over a local JSONL manifest file.
+    Uploads the manifest to S3, submits the job, polls until it finishes,
+    then streams the output back as {recordId: response text}, or None on failure.
+    """
+    s3 = boto3.client("s3", config=BOTO_CONFIG)
+    bedrock_jobs = boto3.client("bedrock", config=BOTO_CONFIG)
+    run_id = uuid.uuid4().hex
+    input_key = f"batch/{run_id}/input.jsonl"
+    output_prefix = f"batch/{run_id}/output/"
+
+    # Multipart upload straight from disk - the manifest holds every image as base64
+    s3.upload_file(manifest_path, bucket, input_key)
+    print(f"⬆️  Uploaded manifest: s3://{bucket}/{input_key}")
+
+    job_arn = bedrock_jobs.create_model_invocation_job(
+        jobName=f"fashion-analysis-{run_id}",
+        roleArn=role_arn,
+        modelId=SONNET_MODEL_ID,
+        inputDataConfig={"s3InputDataConfig": {
+            "s3Uri": f"s3://{bucket}/{input_key}",
+            "s3InputFormat": "JSONL",
+        }},
+        outputDataConfig={"s3OutputDataConfig": {
+            "s3Uri": f"s3://{bucket}/{output_prefix}",
+        }},
+    )["jobArn"]
+    print(f"🚀 Submitted batch job: {job_arn}")
+
+    # Poll until the job reaches a terminal state
+    while True:
+        status = bedrock_jobs.get_model_invocation_job(jobIdentifier=job_arn)["status"]
+        print(f"   ⏳ Batch job status: {status}")
+        if status in ("Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"):
+            break
+        time.sleep(BATCH_POLL_SECONDS)
+
+    if status not in ("Completed", "PartiallyCompleted"):
+        print(f"❌ Batch job ended with status {status}")
+        return None
+
+    # Output lands under <output_prefix>/<job_id>/input.jsonl.out
+    job_id = job_arn.rsplit("/", 1)[-1]
+    output = s3.get_object(Bucket=bucket, Key=f"{output_prefix}{job_id}/input.jsonl.out")
+
+    responses = {}
+    for line in output["Body"].iter_lines():
+        if not line:
+            continue
+        record = json_loads(line)
+        model_output = record.get("modelOutput")
+        if model_output:
+            responses[record["recordId"]] = model_output["content"][0]["text"]
+    return responses
+
+
+def analyze_batch(pending: list, bucket: str, role_arn: str):
+    """
+    Analyze images with a Bedrock batch inference job, yielding (image_file, rows).
+    Only shows and images missing from the local caches become job records.
+    """
+    # One metadata record per show and one analysis record per distinct image
+    print(f"\n📝 Building batch manifest for {len(pending)} images...")
+    # Records are written to disk as they are built rather than held in memory
+    manifest = tempfile.NamedTemporaryFile("w", suffix=".jsonl", encoding="utf-8", delete=False)
+    record_count = 0
+    meta_records = {}  # show -> recordId of its single metadata request
+    analysis_records = {}  # image hash -> recordId of its single analysis request
+    analyses = {}  # image hash -> analysis (from the local cache or the job output)
+    digests = {}  # pending index -> image hash
+    with ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS) as executor:
+        images = executor.map(preprocess_image_cached, [image_file for image_file, _ in pending])
+
+        for idx, ((image_file, db_original_name), image_bytes) in enumerate(zip(pending, images)):
+            if not image_bytes:
+                print(f"   ❌ Failed to preprocess image: {image_file.name}")
+                continue
+            show = show_prefix(db_original_name)
+            if show not in meta_records and get_cached_show_metadata(show) is None:
+                # Only shows whose filenames don't parse need a Claude metadata record
+                metadata = parse_filename_metadata(db_original_name)
+                if metadata:
+                    cache_show_metadata(show, metadata)
+                else:
+                    meta_records[show] = f"{idx}-meta"
+                    manifest.write(batch_record(meta_records[show], metadata_body(db_original_name)) + "\n")
+                    record_count += 1
+
+            digest = digests[idx] = image_hash(image_bytes)
+            if digest in analysis_records or digest in analyses:
+                continue
+            cached = get_cached_analysis(digest)
+            if cached is not None:
+                analyses[digest] = cached
+                continue
+            analysis_records[digest] = f"{idx}-analysis"
+            manifest.write(batch_record(analysis_records[digest], analysis_body(image_bytes)) + "\n")
+            record_count += 1
+    manifest.close()
+
+    try:
+        if not record_count:
+            print("♻️  Every image was found in the local cache - no batch job needed")
+        responses = run_batch_job(manifest.name, bucket, role_arn) if record_count else {}
+    finally:
+        os.unlink(manifest.name)
+    if responses is None:
+        return
+
+    for show, record_id in meta_records.items():
+        try:
+            metadata = parse_metadata_response(responses[record_id])
+        except Exception as e:
+            print(f"⚠️ Metadata extraction failed: {e}")
+            metadata = dict(UNKNOWN_METADATA)
+        cache_show_metadata(show, metadata)
+
+    for digest, record_id in analysis_records.items():
+        if record_id not in responses:
+            continue
+        try:
+            analyses[digest] = parse_analysis_response(responses[record_id])
+            issues = validate_analysis(analyses[digest])
+            if issues:
+                raise ValueError("; ".join(issues))
+        except Exception as e:
+            print(f"⚠️ Image analysis failed: {e}")
+            analyses[digest] = dict(EMPTY_ANALYSIS)
+        cache_analysis(digest, analyses[digest])
+
+    for idx, (image_file, db_original_name) in enumerate(pending):
+        analysis = analyses.get(digests.get(idx))
+        if analysis is None:
+            print(f"   ❌ No batch output for {image_file.name}")
+            continue
+
+        metadata = get_cached_show_metadata(show_prefix(db_original_name)) or dict(UNKNOWN_METADATA)
+
+        yield image_file, build_rows(db_original_name, metadata, analysis)
+
+
+def process_images(input_folder: str, mode: str = "realtime", batch_bucket: str = None, role_arn: str = None,
+                   workers: int = BEDROCK_WORKERS, preprocess=preprocess_image_cached):
     """
     Recursively process all images in input folder and subfolders,
     saving results to DynamoDB (New_Fashion_Analysis) and skipping
     images already processed.
+
+    mode="batch" submits a Bedrock batch inference job instead of on-demand
+    calls; runs too small for a batch job fall back to realtime.
+    preprocess (realtime mode only) turns an image path into the JPEG bytes
+    sent to Claude, e.g. to segment images in memory on the way in.
     """
-    # Load existing filenames first
-    load_existing_filenames()
-    
     input_path = Path(input_folder)
     if not input_path.exists():
         print(f"❌ Error: Input folder '{input_folder}' does not exist")
         return
 
-    # Supported image formats
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
-
     # Recursively get all image files
-    image_files = [
-        f for f in input_path.rglob("*")
-        if f.is_file() and f.suffix.lower() in image_extensions
-    ]
+    image_files = [Path(p) for p in iter_images(input_path)]
 
     if not image_files:
         print(f"❌ No images found in {input_folder}")
@@ -442,73 +1195,53 @@ def process_images(input_folder: str):
     stats["total_found"] = len(image_files)
     print(f"📸 Found {len(image_files)} images to process (recursive)\n")
 
-    # Global batch writer
-    with table.batch_writer() as batch:
-        for idx, image_file in enumerate(image_files, 1):
-            # Get original filename from file
-            original_filename = image_file.name
-            
-            # Handle _segmented files - remove _segmented suffix
-            if '_segmented' in original_filename:
-                base_name = original_filename.rsplit('_segmented', 1)[0]
-                original_filename = f"{base_name}.jpg"
-            
-            # Format filename to match DynamoDB format (Proper-Case-With-Dashes.jpg)
-            db_original_name = format_for_dynamodb(original_filename)
-
-            # Check if already processed (instant lookup from cache)
-            if check_if_processed(db_original_name):
-                print(f"   ⏭️  SKIPPED (already processed)")
-                stats["skipped"] += 1
-                continue
+    # Look up only the filenames we are about to process (local cache first, then the GSI)
+    print("📥 Checking existing filenames in DynamoDB...")
+    db_names = [get_db_original_name(f) for f in image_files]
+    seen = load_seen_cache()
+    # Query each distinct filename once, and only those the cache doesn't already know
+    unseen = [name for name in dict.fromkeys(db_names) if name not in seen]
+    with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as executor:
+        found = {name for name, hit in zip(unseen, executor.map(check_if_processed, unseen)) if hit}
+    save_seen_cache(found)
+    processed = seen | found
 
-            print(f"\n🔍 [{idx}/{len(image_files)}] Processing: {original_filename}")
-            stats["processed"] += 1
+    # Filter out already-processed images before any Bedrock work
+    pending = []
+    for image_file, db_original_name in zip(image_files, db_names):
+        is_processed = db_original_name in processed
+        status = "✅ EXISTS in DynamoDB" if is_processed else "❌ NOT in DynamoDB (new)"
+        print(f"   📝 Original name: {db_original_name} | {status}")
+        if is_processed:
+            print(f"   ⏭️  SKIPPED (already processed)")
+            stats["skipped"] += 1
+            continue
+        pending.append((image_file, db_original_name))
 
-            try:
-                # Extract metadata
-                print(f"   📋 Extracting metadata...")
-                metadata = extract_metadata(db_original_name)
-
-                # Preprocess image
-                print(f"   🖼️  Preprocessing image...")
-                image_b64 = preprocess_image(image_file)
-                if not image_b64:
-                    print(f"   ❌ Failed to preprocess image")
-                    continue
-
-                # Analyze image
-                print(f"   🤖 Analyzing image with Claude (via Bedrock)...")
-                analysis = analyze_image(image_b64)
-
-                timestamp = datetime.utcnow().isoformat()
-                items_found = analysis.get("clothing_items", [])
-                print(f"   ✅ Found {len(items_found)} clothing items")
-
-                # Insert each item into DynamoDB
-                for item in items_found:
-                    image_id = f"{db_original_name}_{item}".lower()
-                    row = {
-                        'image_id': image_id,
-                        'original_image_name': db_original_name,
-                        'timestamp': timestamp,
-                        'item_name': item,
-                        'materials': analysis["material_decomposition"].get(item, "unknown"),
-                        'color_hex': analysis["item_colors_hex"].get(item, "unknown"),
-                        'color_name': analysis["item_colors_name"].get(item, "unknown"),
-                        'designer': metadata.get("designer", "unknown"),
-                        'collection': metadata.get("collection", "unknown"),
-                        'season': metadata.get("season", "unknown"),
-                        'event': metadata.get("event", "unknown"),
-                        'runway_date': RUNWAY_DATE_ISO,
-                    }
-                    batch.put_item(Item=row)
-                    print(f"   ⬆️  Inserted: {image_id}")
-                    stats["total_items_inserted"] += 1
+    stats["processed"] = len(pending)
 
-            except Exception as e:
-                print(f"   ❌ Error processing {original_filename}: {e}")
-                continue
+    if mode == "batch" and len(pending) * 2 >= BATCH_MIN_RECORDS:
+        results = analyze_batch(pending, batch_bucket, role_arn)
+    else:
+        if mode == "batch":
+            print(f"ℹ️  Only {len(pending)} new images - too few for a batch job, using realtime mode")
+        results = analyze_realtime(pending, workers, preprocess)
+
+    # Rows are queued from this thread; BatchWriteItem requests go out in parallel
+    written = set()
+    with ParallelBatchWriter(table) as batch:
+        for idx, (image_file, rows) in enumerate(results, 1):
+            print(f"\n✅ [{idx}/{len(pending)}] {image_file.name}: {len(rows)} clothing items")
+
+            # Insert each item into DynamoDB
+            for row in rows:
+                batch.put_item(Item=row)
+                print(f"   ⬆️  Inserted: {row['image_id']}")
+                stats["total_items_inserted"] += 1
+                written.add(row['original_image_name'])
+
+    # Remember this run's images so the next run skips them without a lookup
+    save_seen_cache(written)
 
     # Print statistics
     print(f"\n" + "="*60)
@@ -533,18 +1266,49 @@ def main():
         "input_folder",
         help="Path to folder containing runway images"
     )
+    parser.add_argument(
+        "--mode",
+        choices=["realtime", "batch"],
+        default="realtime",
+        help="realtime: on-demand Bedrock calls; batch: Bedrock batch inference job (cheaper, for large offline runs)"
+    )
+    parser.add_argument(
+        "--batch-bucket",
+        default=os.environ.get("BATCH_BUCKET"),
+        help="S3 bucket for batch manifests and outputs (default: $BATCH_BUCKET)"
+    )
+    parser.add_argument(
+        "--role-arn",
+        default=os.environ.get("BATCH_ROLE_ARN"),
+        help="IAM role Bedrock assumes to read/write the batch bucket (default: $BATCH_ROLE_ARN)"
+    )
+    
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BEDROCK_WORKERS,
+        help=f"Concurrent Bedrock requests in realtime mode, 1-{MAX_BEDROCK_WORKERS} (default: {BEDROCK_WORKERS})"
+    )
     
     args = parser.parse_args()
+
+    if not 1 <= args.concurrency <= MAX_BEDROCK_WORKERS:
+        parser.error(f"--concurrency must be between 1 and {MAX_BEDROCK_WORKERS}")
+
+    if args.mode == "batch" and not (args.batch_bucket and args.role_arn):
+        parser.error("--mode batch requires --batch-bucket and --role-arn")
     
     print("=" * 60)
     print("FASHION IMAGE ANALYSIS - AWS BEDROCK VERSION")
     print("=" * 60)
     print(f"Input folder: {args.input_folder}")
     print(f"AWS Region: {REGION}")
+    print(f"Mode: {args.mode}")
+    print(f"Concurrency: {args.concurrency}")
     print(f"DynamoDB Table: New_Fashion_Analysis")
     print("=" * 60 + "\n")
     
-    process_images(args.input_folder)
+    process_images(args.input_folder, args.mode, args.batch_bucket, args.role_arn, args.concurrency)
 
 
 if __name__ == "__main__":
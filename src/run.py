@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Single-pass pipeline: segment each downloaded runway image and analyze it
+with Claude straight from memory.
+
+Running runway_segmentation.py then fashion_analysis_local.py decodes every
+image twice and re-reads the segmented PNG from disk; here each image is
+decoded once, segmented, and the cut-out is JPEG-encoded for Bedrock directly.
+The segmented PNG is still written to segmented/ as the pipeline's artifact.
+
+Segmentation happens on the single prefetch thread, one image per U-2-Net call,
+so it caps throughput at one model run at a time however high --concurrency is.
+For large backlogs segment first with the batched, multi-process script,
+    python runway_segmentation.py images -o segmented
+and this script then reuses those up-to-date cut-outs instead of re-segmenting.
+
+Run from src/:
+    cd src
+    python run.py
+    python run.py --alpha-matting     # higher quality segmentation (slower)
+    python run.py --concurrency 16    # concurrent Bedrock requests
+"""
+
+import argparse
+from pathlib import Path
+
+from PIL import Image
+from rembg import new_session
+
+from fashion_analysis_local import BEDROCK_WORKERS, MAX_BEDROCK_WORKERS, encode_image, process_images
+from runway_segmentation import PNG_COMPRESS_LEVEL, _load, cutout
+
+IMAGES_DIR = Path(__file__).parent / "images"
+SEGMENTED_DIR = Path(__file__).parent / "segmented"
+
+
+class InMemorySegmenter:
+    """Path -> Claude-ready JPEG bytes, segmenting on the way (one U-2-Net session per run)"""
+
+    def __init__(self, alpha_matting=False):
+        self.alpha_matting = alpha_matting
+        self._session = None
+
+    def __call__(self, image_file: Path):
+        segmented_file = SEGMENTED_DIR / image_file.relative_to(IMAGES_DIR).parent / f"{image_file.stem}_segmented.png"
+        try:
+            # Reuse an up-to-date cut-out from an earlier run instead of re-segmenting
+            if segmented_file.exists() and segmented_file.stat().st_mtime >= image_file.stat().st_mtime:
+                with Image.open(segmented_file) as img:
+                    return encode_image(img)
+
+            # Called from the single prefetch thread, so lazy init needs no lock
+            if self._session is None:
+                self._session = new_session("u2net")
+            # Same steps as runway_segmentation's unbatched path, keeping the
+            # cut-out in memory so it can be encoded for Claude without a re-read
+            img = _load(image_file)
+            output = cutout(img, self._session.predict(img)[0], self.alpha_matting)
+            segmented_file.parent.mkdir(parents=True, exist_ok=True)
+            output.save(segmented_file, "PNG", compress_level=PNG_COMPRESS_LEVEL)
+            return encode_image(output)
+        except Exception as e:
+            print(f"⚠️ Segmentation failed for {image_file}: {e}")
+            return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segment and analyze runway images in one pass")
+    parser.add_argument("--alpha-matting", action="store_true", help="Enable alpha matting in rembg")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BEDROCK_WORKERS,
+        help=f"Concurrent Bedrock requests, 1-{MAX_BEDROCK_WORKERS} (default: {BEDROCK_WORKERS})"
+    )
+    args = parser.parse_args()
+
+    if not 1 <= args.concurrency <= MAX_BEDROCK_WORKERS:
+        parser.error(f"--concurrency must be between 1 and {MAX_BEDROCK_WORKERS}")
+
+    process_images(
+        str(IMAGES_DIR),
+        workers=args.concurrency,
+        preprocess=InMemorySegmenter(args.alpha_matting),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,164 @@ Preserves folder structure in output
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from rembg import remove
-from PIL import Image
+import numpy as np
+from rembg import new_session
+from rembg.bg import alpha_matting_cutout, naive_cutout
+from PIL import Image, ImageOps
 import argparse
 
+# Images per U-2-Net forward pass in the worker processes
+BATCH_SIZE = 8
+# U-2-Net input normalisation (as in rembg's U2netSession)
+U2NET_MEAN = (0.485, 0.456, 0.406)
+U2NET_STD = (0.229, 0.224, 0.225)
+U2NET_SIZE = (320, 320)
+# zlib level for the segmented PNGs: level 1 encodes several times faster than the
+# default 6, for slightly larger files
+PNG_COMPRESS_LEVEL = 1
+# Per-worker threads that decode inputs and encode outputs (PIL releases the GIL for both)
+IO_THREADS = 4
+# INT8 copy of rembg's U-2-Net, written next to the downloaded FP32 model
+U2NET_INT8_NAME = "u2net_int8.onnx"
 
-def process_images(input_folder, output_folder, alpha_matting=False):
+
+def predict_masks(session, imgs):
+    """
+    U-2-Net masks for several images from one ONNX Runtime call.
+    Mirrors U2netSession.predict, but stacks the normalised inputs into a single batch.
+    """
+    inner = session.inner_session
+    input_name = inner.get_inputs()[0].name
+    batch = np.concatenate([
+        session.normalize(img, U2NET_MEAN, U2NET_STD, U2NET_SIZE)[input_name] for img in imgs
+    ])
+    preds = inner.run(None, {input_name: batch})[0][:, 0, :, :]
+
+    masks = []
+    for img, pred in zip(imgs, preds):
+        mi, ma = pred.min(), pred.max()
+        pred = (pred - mi) / (ma - mi)
+        mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+        masks.append(mask.resize(img.size, Image.LANCZOS))
+    return masks
+
+
+def cutout(img, mask, alpha_matting=False):
+    """Apply a mask the way remove() does, returning the RGBA cut-out"""
+    img = img.convert("RGBA")
+    if alpha_matting:
+        try:
+            return alpha_matting_cutout(img, mask, 240, 10, 10)
+        except ValueError:
+            pass
+    return naive_cutout(img, mask)
+
+
+def quantized_model_path():
+    """
+    Path to a dynamically INT8-quantized U-2-Net, created on first use from the
+    FP32 model rembg downloads. Weights are UINT8: ONNX Runtime's CPU ConvInteger
+    kernel only takes unsigned inputs.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from rembg.sessions.u2net import U2netSession
+
+    fp32 = Path(U2netSession.download_models())
+    int8 = fp32.with_name(U2NET_INT8_NAME)
+    if not int8.exists():
+        print(f"Quantizing {fp32.name} to INT8...")
+        quantize_dynamic(str(fp32), str(int8) + ".tmp", weight_type=QuantType.QUInt8)
+        os.replace(str(int8) + ".tmp", int8)
+    return int8
+
+
+def default_workers():
+    """
+    One worker per CPU core, or a single worker when ONNX Runtime can use CUDA:
+    every worker opens its own session on the same GPU, so more would run it
+    out of memory.
+    """
+    import onnxruntime
+
+    if "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+        return 1
+    return os.cpu_count() or 1
+
+
+# Per-process U-2-Net session and I/O threads, created once by _init_worker
+SESSION = None
+IO_POOL = None
+# Cleared if the model turns out to have a fixed batch dimension of 1
+BATCHED = True
+
+
+def _init_worker(single_threaded, model_path=None):
+    """
+    Load the model once per worker process (remove() without a session reloads it per image).
+    A model_path loads that ONNX file instead, with U-2-Net's pre/post-processing.
+    """
+    global SESSION, IO_POOL
+    if single_threaded:
+        # rembg sizes ONNX Runtime's thread pools from this; one thread per
+        # process avoids oversubscribing the cores the other workers use
+        os.environ["OMP_NUM_THREADS"] = "1"
+    if model_path:
+        SESSION = new_session("u2net_custom", model_path=str(model_path))
+    else:
+        SESSION = new_session("u2net")
+    IO_POOL = ThreadPoolExecutor(max_workers=IO_THREADS)
+
+
+def _load(image_file):
+    with Image.open(image_file) as img:
+        return ImageOps.exif_transpose(img).convert("RGB")
+
+
+def _save(img, mask, alpha_matting, output_file):
+    cutout(img, mask, alpha_matting).save(output_file, "PNG", compress_level=PNG_COMPRESS_LEVEL)
+
+
+def _process_batch(batch, alpha_matting):
+    """Segment a batch of (image_file, output_file) pairs in a worker process and save the PNGs"""
+    global BATCHED
+    messages = []
+    imgs, outputs = [], []
+    # Decode the whole batch concurrently
+    loads = [(IO_POOL.submit(_load, image_file), image_file, output_file) for image_file, output_file in batch]
+    for future, image_file, output_file in loads:
+        try:
+            imgs.append(future.result())
+            outputs.append(output_file)
+        except Exception as e:
+            messages.append(f"✗ Error processing {image_file}: {str(e)}")
+
+    masks = None
+    if BATCHED and len(imgs) > 1:
+        try:
+            masks = predict_masks(SESSION, imgs)
+        except Exception:
+            BATCHED = False  # fixed-batch model - fall back to one image per call
+
+    # PNG encodes run in the background while the next masks are predicted
+    saves = []
+    for idx, (img, output_file) in enumerate(zip(imgs, outputs)):
+        try:
+            mask = masks[idx] if masks else SESSION.predict(img)[0]
+            saves.append((IO_POOL.submit(_save, img, mask, alpha_matting, output_file), output_file))
+        except Exception as e:
+            messages.append(f"✗ Error processing {output_file}: {str(e)}")
+    for future, output_file in saves:
+        try:
+            future.result()
+            messages.append(f"✓ Saved: {output_file}")
+        except Exception as e:
+            messages.append(f"✗ Error processing {output_file}: {str(e)}")
+    return messages
+
+
+def process_images(input_folder, output_folder, alpha_matting=False, workers=None, int8=False):
     input_path = Path(input_folder)
     output_path = Path(output_folder)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -34,39 +185,46 @@ def process_images(input_folder, output_folder, alpha_matting=False):
     print(f"Output root: {output_folder}")
     print("-" * 50)
 
-    for idx, image_file in enumerate(image_files, 1):
+    # Work out which images need segmenting before starting any workers.
+    # One walk of the output tree replaces an exists() stat per input image;
+    # only outputs that are actually present get stat'ed for freshness.
+    existing = {p.relative_to(output_path) for p in output_path.rglob("*_segmented.png")}
+    todo = []
+    for image_file in image_files:
         try:
             # Preserve relative folder structure
             relative_path = image_file.relative_to(input_path)
-            output_subfolder = output_path / relative_path.parent
-            output_subfolder.mkdir(parents=True, exist_ok=True)
-
-            # Output file path
-            output_file = output_subfolder / f"{image_file.stem}_segmented.png"
+            relative_output = relative_path.parent / f"{image_file.stem}_segmented.png"
+            output_file = output_path / relative_output
 
-            # Skip if already processed
-            if output_file.exists():
+            # Skip if already processed and the source hasn't changed since
+            if relative_output in existing and output_file.stat().st_mtime >= image_file.stat().st_mtime:
                 print(f"→ Skipping (already processed): {relative_path}")
                 continue
-
-            print(f"Processing [{idx}/{len(image_files)}]: {relative_path}")
-
-            with Image.open(image_file) as img:
-                output = remove(
-                    img,
-                    alpha_matting=alpha_matting,
-                    alpha_matting_foreground_threshold=240,
-                    alpha_matting_background_threshold=10,
-                    alpha_matting_erode_size=10
-                )
-
-                output.save(output_file, "PNG")
-                print(f"✓ Saved: {output_file}")
-
+            todo.append((image_file, output_file))
         except Exception as e:
             print(f"✗ Error processing {image_file}: {str(e)}")
-            continue
 
+    # Create each output folder once rather than once per image
+    for folder in {output_file.parent for _, output_file in todo}:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    if todo:
+        workers = min(workers or default_workers(), len(todo))
+        # Quantize in the parent so the workers don't race to write the same file
+        model_path = quantized_model_path() if int8 else None
+        print(f"Segmenting {len(todo)} images with {workers} worker process(es)")
+        # Each worker holds its own session; every available ORT provider is used, e.g. CUDA
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(workers > 1, model_path)
+        ) as executor:
+            batches = [todo[i:i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)]
+            results = executor.map(_process_batch, batches, [alpha_matting] * len(batches))
+            done = 0
+            for messages in results:
+                for message in messages:
+                    done += 1
+                    print(f"[{done}/{len(todo)}] {message}")
 
     print("-" * 50)
     print(f"Processing complete! Segmented images saved to: {output_folder}")
@@ -90,6 +248,17 @@ def main():
         action="store_true",
         help="Enable alpha matting (slower, better edges)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes, each with its own model (default: CPU count, or 1 with CUDA)"
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Run an INT8-quantized U-2-Net (faster on CPU, slightly softer masks)"
+    )
 
     args = parser.parse_args()
 
@@ -97,7 +266,7 @@ def main():
         print(f"Error: Input folder '{args.input_folder}' does not exist")
         return
 
-    process_images(args.input_folder, args.output, args.alpha_matting)
+    process_images(args.input_folder, args.output, args.alpha_matting, args.workers, args.int8)
 
 
 if __name__ == "__main__":
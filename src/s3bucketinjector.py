@@ -1,25 +1,38 @@
 import os
 import boto3
-from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # AWS config
 bucket_name = "runwayimages"
 region = "eu-west-2"  # change if needed
 
-# Initialize S3 client
-s3 = boto3.client("s3", region_name=region)
+# Concurrent file uploads; large files are additionally split into parallel multipart chunks
+UPLOAD_WORKERS = 32
+TRANSFER_CONFIG = TransferConfig(max_concurrency=10, multipart_threshold=8 * 1024 * 1024)
 
-def file_exists_in_s3(bucket, key):
+# Initialize S3 client (one shared, thread-safe client with a pool for the upload threads)
+s3 = boto3.client("s3", region_name=region, config=Config(max_pool_connections=64))
+
+def list_existing_keys(bucket):
+    """All keys already in the bucket - one LIST call per 1000 keys instead of a HEAD per file"""
+    existing = set()
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        existing.update(obj["Key"] for obj in page.get("Contents", []))
+    return existing
+
+def upload_one(local_path, s3_key):
     try:
-        s3.head_object(Bucket=bucket, Key=key)
-        return True
-    except ClientError as e:
-        if e.response['Error']['Code'] == "404":
-            return False
-        else:
-            raise
+        s3.upload_file(local_path, bucket_name, s3_key, Config=TRANSFER_CONFIG)
+        print(f"Uploaded: {local_path} → s3://{bucket_name}/{s3_key}")
+    except Exception as e:
+        print(f"Error uploading {local_path}: {e}")
 
 def upload_images_to_s3(local_base="images"):
+    existing = list_existing_keys(bucket_name)
+
+    to_upload = []
     for root, dirs, files in os.walk(local_base):
         for filename in files:
             local_path = os.path.join(root, filename)
@@ -28,15 +41,15 @@ def upload_images_to_s3(local_base="images"):
             relative_path = os.path.relpath(local_path, local_base)
             s3_key = relative_path.replace("\\", "/")  # For Windows paths
 
-            if file_exists_in_s3(bucket_name, s3_key):
+            if s3_key in existing:
                 print(f"Skipped (already exists): {s3_key}")
                 continue
+            to_upload.append((local_path, s3_key))
 
-            try:
-                s3.upload_file(local_path, bucket_name, s3_key)
-                print(f"Uploaded: {local_path} → s3://{bucket_name}/{s3_key}")
-            except Exception as e:
-                print(f"Error uploading {local_path}: {e}")
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        futures = [executor.submit(upload_one, local_path, s3_key) for local_path, s3_key in to_upload]
+        for future in as_completed(futures):
+            future.result()
 
 if __name__ == "__main__":
     upload_images_to_s3()
@@ -1,13 +1,104 @@
 import os
+import json
+import shutil
+import hashlib
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 
+try:
+    import lxml  # noqa: F401  C parser (libxml2) for BeautifulSoup
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; ImageScraper/1.0; +https://example.com/bot)"
 }
 
+# Shared session: keep-alive connections (and TLS sessions) are reused per host
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=3, backoff_factor=0.3))
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+DOWNLOAD_CHUNK = 64 * 1024
+# URL path separators -> folder-name dashes in one C-level pass
+_PATH_TO_FOLDER = str.maketrans("/", "-")
+# Concurrent image downloads per page (backed by the session's connection pool)
+DOWNLOAD_WORKERS = 16
+# Pages scraped at once; PAGE_WORKERS * DOWNLOAD_WORKERS stays within pool_maxsize
+PAGE_WORKERS = 4
+# Per-page sidecar of {image url: {"etag", "length"}} from the last download
+MANIFEST_NAME = "manifest.json"
+
+
+def _validator(headers) -> dict:
+    """Cache validators for an image response (HEAD or GET)"""
+    return {"etag": headers.get("ETag"), "length": headers.get("Content-Length")}
+
+
+def load_manifest(folder_name: str):
+    """Previous run's validators for a page folder, or None if it has no manifest"""
+    try:
+        with open(os.path.join(folder_name, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(folder_name: str, manifest: dict):
+    path = os.path.join(folder_name, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _download(img_url: str, filepath: str, known: dict = None):
+    """
+    Stream one image to filepath, returning its validators (None on failure).
+    With known validators for an existing file, a HEAD request decides first
+    whether the image changed; unchanged images are not re-downloaded.
+    """
+    try:
+        if known and os.path.exists(filepath):
+            head = SESSION.head(img_url, timeout=10, allow_redirects=True)
+            if head.ok and _validator(head.headers) == known:
+                return known
+            print(f"🔄 Changed upstream: {filepath}")
+
+        # Stream to a temporary file so a failed download leaves no partial image
+        with SESSION.get(img_url, timeout=15, stream=True) as img_resp:
+            img_resp.raise_for_status()
+            # Socket -> file in fixed-size chunks, honouring any Content-Encoding
+            img_resp.raw.decode_content = True
+            with open(filepath + ".part", "wb") as f:
+                shutil.copyfileobj(img_resp.raw, f, length=DOWNLOAD_CHUNK)
+        os.replace(filepath + ".part", filepath)
+
+        print(f"✅ Saved: {filepath}")
+        return _validator(img_resp.headers)
+
+    except Exception as e:
+        print(f"❌ Error downloading {img_url}: {e}")
+        return None
+
+
+def fetch_page(page_url: str):
+    """Fetch and parse a page; None on HTTP errors"""
+    response = SESSION.get(page_url, timeout=15)
+    if response.status_code != 200:
+        print(f"❌ Failed to fetch page: {response.status_code}")
+        return None
+
+    # Raw bytes let the parser sniff the encoding itself
+    return BeautifulSoup(response.content, HTML_PARSER)
+
 
 def scrape_images_from_page(page_url: str):
     print(f"\nScraping: {page_url}")
@@ -15,30 +106,26 @@ def scrape_images_from_page(page_url: str):
     # Build folder name from URL
     parsed_page = urlparse(page_url)
     path_after = parsed_page.path.strip("/") or parsed_page.netloc
-    subfolder_name = path_after.replace("/", "-")
+    subfolder_name = path_after.translate(_PATH_TO_FOLDER)
     folder_name = os.path.join("images", subfolder_name)
 
-    # ✅ Skip if already scraped
-    if os.path.exists(folder_name) and os.listdir(folder_name):
+    # ✅ Skip if already scraped - folders with a manifest are revalidated cheaply instead
+    manifest = load_manifest(folder_name)
+    if manifest is None and os.path.exists(folder_name) and os.listdir(folder_name):
         print(f"⏭️ Skipping (already scraped): {folder_name}")
         return
+    manifest = manifest or {}
 
     os.makedirs(folder_name, exist_ok=True)
 
     # Fetch HTML
-    response = requests.get(page_url, headers=HEADERS, timeout=15)
-    if response.status_code != 200:
-        print(f"❌ Failed to fetch page: {response.status_code}")
+    soup = fetch_page(page_url)
+    if soup is None:
         return
 
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    container = soup.find(
-        "div",
-        class_="entry-content alignfull wp-block-post-content is-layout-flow "
-               "wp-container-core-post-content-is-layout-a77db08e "
-               "wp-block-post-content-is-layout-flow"
-    )
+    # Match on the two stable class tokens rather than the full (build-generated)
+    # class string - a per-token check under both lxml and html.parser
+    container = soup.select_one("div.entry-content.wp-block-post-content")
 
     if not container:
         print("⚠️ Target container not found.")
@@ -47,31 +134,37 @@ def scrape_images_from_page(page_url: str):
     img_tags = container.find_all("img")
     print(f"Found {len(img_tags)} images")
 
-    for idx, img in enumerate(img_tags, start=1):
+    # filepath -> url; one download per target file even if an image repeats
+    downloads = {}
+    for img in img_tags:
         src = img.get("src")
         if not src or src.startswith("data:"):
             continue
 
         img_url = urljoin(page_url, src)
 
-        try:
-            img_resp = requests.get(img_url, headers=HEADERS, timeout=15)
-            img_resp.raise_for_status()
-
-            parsed_img = urlparse(img_url)
-            filename = os.path.basename(parsed_img.path) or f"image_{idx}.jpg"
-            filepath = os.path.join(folder_name, filename)
+        parsed_img = urlparse(img_url)
+        # URL-derived fallback name stays stable across runs, so skip-if-exists still works
+        filename = (
+            os.path.basename(parsed_img.path)
+            or f"image_{hashlib.blake2b(img_url.encode(), digest_size=6).hexdigest()}.jpg"
+        )
+        filepath = os.path.join(folder_name, filename)
 
-            if os.path.exists(filepath):
-                continue  # optional: skip existing files
+        if os.path.exists(filepath) and img_url not in manifest:
+            continue  # optional: skip existing files (no validators to check against)
 
-            with open(filepath, "wb") as f:
-                f.write(img_resp.content)
+        downloads.setdefault(filepath, img_url)
 
-            print(f"✅ Saved: {filepath}")
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        urls = list(downloads.values())
+        results = executor.map(_download, urls, downloads.keys(), [manifest.get(url) for url in urls])
+        for img_url, validators in zip(urls, results):
+            # Servers sending neither header give nothing to revalidate against
+            if validators and any(validators.values()):
+                manifest[img_url] = validators
 
-        except Exception as e:
-            print(f"❌ Error downloading {img_url}: {e}")
+    save_manifest(folder_name, manifest)
 
 
 def load_urls_from_txt(file_path: str) -> list[str]:
@@ -85,12 +178,16 @@ def load_urls_from_txt(file_path: str) -> list[str]:
 
 if __name__ == "__main__":
     url_file = "urls.txt"
-    page_urls = load_urls_from_txt(url_file)
+    # Repeated URLs would race on the same folder and manifest
+    page_urls = list(dict.fromkeys(load_urls_from_txt(url_file)))
 
     print(f"Loaded {len(page_urls)} URLs")
 
-    for url in page_urls:
-        try:
-            scrape_images_from_page(url)
-        except Exception as e:
-            print(f"❌ Failed scraping {url}: {e}")
+    # Pages are independent (one folder each), so fan out across them too
+    with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as executor:
+        futures = {executor.submit(scrape_images_from_page, url): url for url in page_urls}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Failed scraping {futures[future]}: {e}")